@@ -0,0 +1,73 @@
+import asyncio
+from aiohttp import web
+from mjpeg import mjpeg_part
+
+
+# asyncio alternative to the Flask dev server for the camera routes. All
+# viewers share one event loop thread; each has a 1-slot frame queue, so a
+# client whose socket is slow to drain simply receives fewer, newer frames.
+
+
+HTML_PAGE = """
+<html>
+  <head>
+    <title>Live Camera</title>
+  </head>
+  <body>
+    <img src="video_feed" width="800">
+  </body>
+</html>
+"""
+
+
+async def index(request):
+    return web.Response(text=HTML_PAGE, content_type="text/html")
+
+
+async def video_feed(request):
+    broadcaster = request.app["streams"].get(request.query.get("profile"))
+    if broadcaster is None:
+        raise web.HTTPNotFound()
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=1)
+    response = web.StreamResponse(
+        headers={"Content-Type": "multipart/x-mixed-replace; boundary=frame"}
+    )
+    await response.prepare(request)
+    broadcaster.subscribe(loop, queue)
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            _, frame_bytes, timestamp = item
+            # write() waits for the socket to drain: per-client backpressure.
+            await response.write(mjpeg_part(frame_bytes, timestamp))
+            queue.sent += 1
+    except ConnectionResetError:
+        pass
+    finally:
+        # Also runs on cancellation, which then propagates to aiohttp.
+        broadcaster.unsubscribe(loop, queue)
+    return response
+
+
+def json_route(func):
+    async def handler(request):
+        # Stats and gallery reloads are blocking calls; keep them off the loop.
+        loop = asyncio.get_running_loop()
+        return web.json_response(await loop.run_in_executor(None, func))
+
+    return handler
+
+
+def run_async_server(streams, port, stats=None, reload_gallery=None):
+    app = web.Application()
+    app["streams"] = streams
+    app.router.add_get("/", index)
+    app.router.add_get("/video_feed", video_feed)
+    if stats is not None:
+        app.router.add_get("/stats", json_route(stats))
+    if reload_gallery is not None:
+        app.router.add_post("/gallery/reload", json_route(reload_gallery))
+    web.run_app(app, host="0.0.0.0", port=port, print=None)
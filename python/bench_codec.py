@@ -0,0 +1,80 @@
+import argparse
+import json
+import random
+import time
+import zlib
+from camera_codec import decode_record, encode_json, encode_record
+
+
+# Compares the JSON camera records with the binary schema in camera_codec:
+# encode/decode cost per record and bytes per record, raw and after batch
+# compression (zlib stands in for the producer's gzip batches).
+
+
+def make_records(cameras, events, rng):
+    records = []
+    for camera_id in range(cameras):
+        heads = rng.randint(0, 6)
+        emp_ids = [
+            "Unknown" if rng.random() < 0.1 else str(rng.randint(1, 5000))
+            for _ in range(heads)
+        ]
+        record = {
+            "faceDetected": heads > 0,
+            "timestamp": time.time(),
+            "headCount": heads,
+            "empIds": emp_ids,
+            "roomId": str(camera_id // 8 + 1),
+            "cameraId": str(camera_id + 1),
+        }
+        if events:
+            record.update(
+                event="change", seq=rng.randint(0, 10 ** 6), epoch=int(time.time() * 1000),
+                changes=["entered", "headCount"], entered=emp_ids[:1], left=[],
+            )
+        records.append(record)
+    return records
+
+
+def measure(records, encode, decode, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encoded = [encode(record) for record in records]
+    encode_us = 1e6 * (time.perf_counter() - start) / (repeat * len(records))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in encoded:
+            decode(data)
+    decode_us = 1e6 * (time.perf_counter() - start) / (repeat * len(records))
+    raw = sum(map(len, encoded)) / len(records)
+    compressed = len(zlib.compress(b"".join(encoded))) / len(records)
+    return encode_us, decode_us, raw, compressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON vs binary camera records")
+    parser.add_argument("--cameras", default="10,100,1000,10000")
+    parser.add_argument("--events", action="store_true", help="include event fields")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(
+        f"{'cameras':>7} {'codec':>6} {'enc us':>7} {'dec us':>7} "
+        f"{'bytes':>6} {'zlib B':>6}"
+    )
+    for cameras in map(int, args.cameras.split(",")):
+        records = make_records(cameras, args.events, rng)
+        for name, encode, decode in (
+            ("json", encode_json, json.loads),
+            ("binary", encode_record, decode_record),
+        ):
+            enc, dec, raw, packed = measure(records, encode, decode, args.repeat)
+            print(
+                f"{cameras:>7} {name:>6} {enc:>7.2f} {dec:>7.2f} "
+                f"{raw:>6.1f} {packed:>6.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
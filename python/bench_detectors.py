@@ -0,0 +1,110 @@
+import argparse
+import json
+import time
+import cv2
+import numpy as np
+from face_detectors import DETECTORS, make_detector
+from face_tracker import box_iou
+
+
+# Per-frame latency and recall of the face detector backends on a recorded
+# clip (e.g. office footage saved from a camera's videoLink). Recall and
+# precision are measured against --truth, a JSON file mapping frame index to
+# full-resolution (top, right, bottom, left) boxes. Without it, the
+# --reference detector run at full resolution serves as pseudo ground
+# truth, which only says how close the cheaper settings get to it.
+
+
+def load_frames(path, stride, limit):
+    cap = cv2.VideoCapture(path)
+    frames = {}
+    index = 0
+    while len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if index % stride == 0:
+            frames[index] = frame
+        index += 1
+    cap.release()
+    return frames
+
+
+def detect(detector, frame, resize):
+    small = cv2.resize(frame, (0, 0), fx=resize, fy=resize) if resize != 1 else frame
+    rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+    start = time.perf_counter()
+    locations = detector.detect(rgb)
+    elapsed = time.perf_counter() - start
+    return [tuple(int(v / resize) for v in box) for box in locations], elapsed
+
+
+def match(found, truth, threshold):
+    """Greedy IoU matching; returns the number of true positives."""
+    if not found or not truth:
+        return 0
+    iou = box_iou(found, truth)
+    hits = 0
+    while iou.size and iou.max() >= threshold:
+        i, j = np.unravel_index(iou.argmax(), iou.shape)
+        hits += 1
+        iou[i, :] = 0
+        iou[:, j] = 0
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face detector backend benchmark")
+    parser.add_argument("video")
+    parser.add_argument("--detectors", default=",".join(DETECTORS))
+    parser.add_argument("--resize", default="0.25,0.5", help="frame_resizing values")
+    parser.add_argument("--truth", help="JSON {frame index: [[t, r, b, l], ...]}")
+    parser.add_argument("--reference", default="yunet")
+    parser.add_argument("--stride", type=int, default=5)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--iou", type=float, default=0.3)
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.stride, args.frames)
+    print(f"{len(frames)} frames from {args.video}")
+    if args.truth:
+        with open(args.truth) as f:
+            truth = {int(k): [tuple(b) for b in v] for k, v in json.load(f).items()}
+        frames = {i: frame for i, frame in frames.items() if i in truth}
+    else:
+        print(f"No --truth: using {args.reference} at full resolution as reference.")
+        reference = make_detector(args.reference)
+        truth = {i: detect(reference, frame, 1.0)[0] for i, frame in frames.items()}
+    total_truth = sum(len(truth[i]) for i in frames)
+
+    print(
+        f"{'detector':>10} {'resize':>6} {'mean ms':>8} {'p95 ms':>7} "
+        f"{'faces/frame':>11} {'recall':>6} {'precision':>9}"
+    )
+    for name in args.detectors.split(","):
+        try:
+            detector = make_detector(name)
+        except (ImportError, FileNotFoundError, cv2.error) as e:
+            print(f"{name:>10} skipped: {e}")
+            continue
+        for resize in map(float, args.resize.split(",")):
+            latencies = []
+            found_total = 0
+            hits = 0
+            for i, frame in frames.items():
+                found, elapsed = detect(detector, frame, resize)
+                latencies.append(elapsed)
+                found_total += len(found)
+                hits += match(found, truth[i], args.iou)
+            latencies = 1000 * np.array(latencies)
+            recall = hits / total_truth if total_truth else float("nan")
+            precision = hits / found_total if found_total else float("nan")
+            print(
+                f"{name:>10} {resize:>6.2f} {latencies.mean():>8.2f} "
+                f"{np.percentile(latencies, 95):>7.2f} "
+                f"{found_total / len(frames):>11.2f} {recall:>6.2f} {precision:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
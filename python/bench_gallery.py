@@ -0,0 +1,69 @@
+import argparse
+import time
+import numpy as np
+from face_index import make_index
+
+
+# Synthetic stand-in for dlib encodings: each employee has a unit-norm
+# identity vector and their enrolled/probe images sit ~0.35 away from it,
+# while different employees are ~1.0+ apart, like real 128-d face encodings.
+def synthetic_gallery(rng, n_people, images_per_person, noise=0.03):
+    centers = rng.normal(size=(n_people, 128))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    ids = np.repeat(np.arange(n_people), images_per_person)
+    encodings = centers[ids] + rng.normal(scale=noise, size=(len(ids), 128))
+    return centers, encodings.astype(np.float32), [str(i) for i in ids]
+
+
+def time_matches(index, batches):
+    start = time.perf_counter()
+    names = []
+    for batch in batches:
+        names.extend(index.match(batch)[0])
+    return names, (time.perf_counter() - start) / len(batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gallery index recall/latency")
+    parser.add_argument("--sizes", default="2000,10000,50000")
+    parser.add_argument("--images-per-person", type=int, default=3)
+    parser.add_argument("--faces-per-tick", type=int, default=8)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--nprobe", default="4,8,16")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'gallery':>8} {'index':>10} {'ms/tick':>9} {'recall':>7} {'build s':>8}")
+    for size in map(int, args.sizes.split(",")):
+        n_people = size // args.images_per_person
+        centers, encodings, names = synthetic_gallery(
+            rng, n_people, args.images_per_person
+        )
+        people = rng.integers(0, n_people, size=(args.ticks, args.faces_per_tick))
+        batches = [
+            centers[row] + rng.normal(scale=0.03, size=(len(row), 128))
+            for row in people
+        ]
+
+        configs = [("exact", {})] + [
+            ("ivf", {"nprobe": int(p)}) for p in args.nprobe.split(",")
+        ]
+        reference = None
+        for kind, kwargs in configs:
+            start = time.perf_counter()
+            index = make_index(kind, **kwargs)
+            index.add(encodings, names)
+            build = time.perf_counter() - start
+            found, latency = time_matches(index, batches)
+            if reference is None:
+                reference = found
+            recall = np.mean([a == b for a, b in zip(found, reference)])
+            label = kind if not kwargs else f"{kind}/{kwargs['nprobe']}"
+            print(
+                f"{size:>8} {label:>10} {latency * 1000:>9.3f} "
+                f"{recall:>7.3f} {build:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
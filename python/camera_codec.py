@@ -0,0 +1,140 @@
+import json
+import struct
+
+
+# Compact binary layout for camera records (JsonOutputJob), version 1.
+# All integers are little-endian. The decoder in
+# server/helpers/camera-codec.ts mirrors this layout.
+#
+#   u8   version (1). JSON records start with "{" (0x7B), so the first byte
+#        also tells the two encodings apart.
+#   u8   flags: bit 0 faceDetected, bit 1 event fields present,
+#        bits 2-3 event (0 snapshot, 1 change, 2 heartbeat),
+#        bits 4-5 motionState (0 absent, 1 Idle, 2 Moving)
+#   f64  timestamp
+#   u32  roomId, u32 cameraId
+#   u16  headCount
+#   ids  empIds: u16 count, then u32 per id ("Unknown" is 0xFFFFFFFF)
+# Only if flag bit 1 is set:
+#   u32  seq, u64 epoch, u8 changes bitmask (entered, left, headCount, motion)
+#   ids  entered, ids left
+
+SCHEMA_VERSION = 1
+UNKNOWN_ID = 0xFFFFFFFF
+
+_HEAD = struct.Struct("<BBdIIH")
+_EVENT = struct.Struct("<IQB")
+_COUNT = struct.Struct("<H")
+
+EVENTS = ("snapshot", "change", "heartbeat")
+MOTION_STATES = (None, "Idle", "Moving")
+CHANGES = ("entered", "left", "headCount", "motion")
+
+
+class EncodeError(ValueError):
+    """Record holds something the binary schema cannot carry (e.g. non-numeric ids)."""
+
+
+def _id(value):
+    if value == "Unknown":
+        return UNKNOWN_ID
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise EncodeError(f"non-numeric id {value!r}")
+    if not 0 <= number < UNKNOWN_ID:
+        raise EncodeError(f"id {value!r} out of range")
+    return number
+
+
+def _pack_ids(ids):
+    return _COUNT.pack(len(ids)) + struct.pack(f"<{len(ids)}I", *map(_id, ids))
+
+
+def _unpack_ids(data, offset):
+    (count,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    ids = struct.unpack_from(f"<{count}I", data, offset)
+    names = ["Unknown" if i == UNKNOWN_ID else str(i) for i in ids]
+    return names, offset + 4 * count
+
+
+def encode_record(face_data):
+    """Binary encoding of one camera record; raises EncodeError if it does not fit."""
+    has_event = "seq" in face_data
+    flags = int(bool(face_data["faceDetected"]))
+    try:
+        flags |= MOTION_STATES.index(face_data.get("motionState")) << 4
+        if has_event:
+            flags |= 2 | EVENTS.index(face_data["event"]) << 2
+    except ValueError as e:
+        raise EncodeError(str(e))
+    parts = [
+        _HEAD.pack(
+            SCHEMA_VERSION, flags, face_data["timestamp"],
+            _id(face_data["roomId"]), _id(face_data["cameraId"]),
+            face_data["headCount"],
+        ),
+        _pack_ids(face_data["empIds"]),
+    ]
+    if has_event:
+        changes = 0
+        for change in face_data.get("changes", ()):
+            changes |= 1 << CHANGES.index(change)
+        parts.append(_EVENT.pack(face_data["seq"], face_data["epoch"], changes))
+        parts.append(_pack_ids(face_data.get("entered", ())))
+        parts.append(_pack_ids(face_data.get("left", ())))
+    return b"".join(parts)
+
+
+def decode_record(data):
+    """Inverse of encode_record; also accepts JSON-encoded records."""
+    if data[:1] == b"{":
+        return json.loads(data)
+    version, flags, timestamp, room_id, camera_id, head_count = _HEAD.unpack_from(data)
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"unsupported camera record version {version}")
+    emp_ids, offset = _unpack_ids(data, _HEAD.size)
+    record = {
+        "faceDetected": bool(flags & 1),
+        "timestamp": timestamp,
+        "headCount": head_count,
+        "empIds": emp_ids,
+        "roomId": str(room_id),
+        "cameraId": str(camera_id),
+    }
+    motion = MOTION_STATES[flags >> 4 & 3]
+    if motion is not None:
+        record["motionState"] = motion
+    if flags & 2:
+        seq, epoch, changes = _EVENT.unpack_from(data, offset)
+        offset += _EVENT.size
+        record["event"] = EVENTS[flags >> 2 & 3]
+        record["seq"] = seq
+        record["epoch"] = epoch
+        record["changes"] = [c for i, c in enumerate(CHANGES) if changes >> i & 1]
+        record["entered"], offset = _unpack_ids(data, offset)
+        record["left"], offset = _unpack_ids(data, offset)
+    return record
+
+
+def encode_json(face_data):
+    return json.dumps(face_data).encode()
+
+
+def make_encoder(name):
+    """Value encoder for REPORT_ENCODING: "json" (default) or "binary".
+
+    The binary encoder falls back to JSON for records it cannot carry, and
+    the decoders accept both.
+    """
+    if name != "binary":
+        return encode_json
+
+    def encode(face_data):
+        try:
+            return encode_record(face_data)
+        except EncodeError:
+            return encode_json(face_data)
+
+    return encode
@@ -0,0 +1,128 @@
+import time
+from collections import Counter
+
+
+class CameraEvents:
+    """Turns periodic camera snapshots into change events plus heartbeats.
+
+    observe() is fed the same face_data record update_json used to send on
+    every tick, and returns the records to send (usually none). A record is
+    emitted when the people in view, the head count or the motion state
+    change and the new state has been seen `min_stable` times in a row, which
+    keeps single-frame recognition flicker off the wire. If nothing changes,
+    a heartbeat is sent every `heartbeat_sec`; it repeats the last reported
+    state, so a change still waiting for `min_stable` stays pending.
+
+    Every record still carries the full camera state, so a consumer can
+    rebuild its view from any single record. It also has these fields:
+      - `event`: "snapshot" for the first record, then "change" or "heartbeat"
+      - `seq`: increments per record; a gap means records were lost
+      - `epoch`: the process start time in ms; it changes when seq restarts
+      - `changes`: which parts of the state changed
+      - `entered` / `left`: empIds that appeared or disappeared
+    """
+
+    def __init__(self, heartbeat_sec=60.0, min_stable=2, poll_sec=0.5):
+        self.heartbeat_sec = heartbeat_sec
+        self.min_stable = min_stable
+        self.poll_sec = poll_sec
+        self.epoch = int(time.time() * 1000)
+        self.seq = 0
+        self.reported = None
+        self.reported_data = None
+        self.reported_ids = Counter()
+        self.pending = None
+        self.pending_count = 0
+        self.last_sent = 0.0
+        self.changes_sent = 0
+        self.heartbeats_sent = 0
+
+    @staticmethod
+    def _state(face_data):
+        return (
+            face_data["headCount"],
+            tuple(sorted(face_data["empIds"])),
+            face_data.get("motionState"),
+        )
+
+    def observe(self, face_data, now=None):
+        now = time.time() if now is None else now
+        state = self._state(face_data)
+        if self.reported is None:
+            return [self._emit(face_data, state, "snapshot", now)]
+        if state != self.reported:
+            if state == self.pending:
+                self.pending_count += 1
+            else:
+                self.pending, self.pending_count = state, 1
+            if self.pending_count >= self.min_stable:
+                return [self._emit(face_data, state, "change", now)]
+        else:
+            self.pending = None
+        if now - self.last_sent >= self.heartbeat_sec:
+            return [self._heartbeat(face_data, now)]
+        return []
+
+    def _heartbeat(self, face_data, now):
+        record = dict(
+            self.reported_data,
+            timestamp=face_data["timestamp"],
+            event="heartbeat",
+            seq=self.seq,
+            epoch=self.epoch,
+            changes=[],
+            entered=[],
+            left=[],
+        )
+        self.seq += 1
+        self.last_sent = now
+        self.heartbeats_sent += 1
+        return record
+
+    def _emit(self, face_data, state, event, now):
+        ids = Counter(face_data["empIds"])
+        changes = []
+        if self.reported is not None:
+            if ids - self.reported_ids:
+                changes.append("entered")
+            if self.reported_ids - ids:
+                changes.append("left")
+            if state[0] != self.reported[0]:
+                changes.append("headCount")
+            if state[2] != self.reported[2]:
+                changes.append("motion")
+        record = dict(
+            face_data,
+            event=event,
+            seq=self.seq,
+            epoch=self.epoch,
+            changes=changes,
+            entered=sorted((ids - self.reported_ids).elements()),
+            left=sorted((self.reported_ids - ids).elements()),
+        )
+        self.seq += 1
+        self.reported = state
+        self.reported_data = face_data
+        self.reported_ids = ids
+        self.pending = None
+        self.last_sent = now
+        self.changes_sent += 1
+        return record
+
+    def stats(self):
+        return {
+            "seq": self.seq,
+            "changesSent": self.changes_sent,
+            "heartbeatsSent": self.heartbeats_sent,
+        }
+
+
+def events_from_env(environ):
+    """CameraEvents when REPORT_MODE=events, else None (fixed-interval dumps)."""
+    if environ.get("REPORT_MODE", "interval") != "events":
+        return None
+    return CameraEvents(
+        heartbeat_sec=float(environ.get("EVENT_HEARTBEAT_SEC", "60")),
+        min_stable=int(environ.get("EVENT_MIN_STABLE", "2")),
+        poll_sec=float(environ.get("EVENT_POLL_SEC", "0.5")),
+    )
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import cv2
+import numpy as np
+from video_stream import CaptureOptions, ReconnectPolicy, ThreadedVideoStream
+
+
+# Reconnect check without a camera: a local clip stands in for the RTSP
+# source. The stream starts before the clip exists (open failures, backoff),
+# the clip then appears, and every end-of-file is a drop the stream has to
+# detect as a stall and reconnect from. Pass --source to run the same check
+# against a real URL, e.g. a loopback RTSP server (mediamtx + ffmpeg -re)
+# that you stop and restart while this runs.
+
+
+def write_clip(path, frames=60, fps=30):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (320, 240))
+    for i in range(frames):
+        writer.write(np.full((240, 320, 3), i * 4 % 255, np.uint8))
+    writer.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture reconnect/backoff check")
+    parser.add_argument("--source", help="URL or file; default: a generated clip")
+    parser.add_argument("--appear-after", type=float, default=2.0,
+                        help="seconds before the generated clip is written")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--mode", choices=["read", "grab"], default="read")
+    parser.add_argument("--backoff", type=float, default=0.2)
+    parser.add_argument("--backoff-max", type=float, default=2.0)
+    parser.add_argument("--stall", type=float, default=1.0)
+    args = parser.parse_args()
+
+    source = args.source
+    if source is None:
+        source = os.path.join(tempfile.mkdtemp(), "clip.avi")
+        threading.Timer(args.appear_after, write_clip, (source,)).start()
+
+    stream = ThreadedVideoStream(
+        source,
+        capture=CaptureOptions(mode=args.mode),
+        reconnect=ReconnectPolicy(
+            initial_sec=args.backoff, max_sec=args.backoff_max, stall_sec=args.stall
+        ),
+    ).start()
+    frames = 0
+    seq = 0
+    health = []
+    deadline = time.time() + args.duration
+    while time.time() < deadline:
+        seq, frame = stream.read_newer(seq, timeout=0.1)
+        if frame is not None:
+            frames += 1
+        if not health or health[-1] != stream.health:
+            health.append(stream.health)
+    stats = stream.stats()
+    stream.stop()
+    print(json.dumps(stats, indent=2))
+    print(f"{frames} frames read, health: {' -> '.join(health)}")
+    ok = frames > 0 and stats["reconnects"] > 0 and "streaming" in health
+    print("OK" if ok else "FAILED: expected frames and at least one reconnect")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import time
+import numpy as np
+from face_tracker import box_iou
+
+
+# Downscale factors tried by the auto-tuner, cheapest first.
+SCALES = (0.1, 0.125, 0.167, 0.25, 0.333, 0.5, 0.75, 1.0)
+
+
+class ResolutionPolicy:
+    """Picks the full-frame downscale from the source resolution.
+
+    The smallest face worth finding is `min_face_px` source pixels or, if
+    that is not set, `min_face_fraction` of the frame height. The frame is
+    scaled so such a face still covers the detector's `min_face` pixels.
+    The default fraction (1/3) reproduces the old fixed 0.25 for HOG on a
+    640x480 feed, and scales 1080p down further instead of paying ~7x the
+    pixels for the same faces.
+    """
+
+    def __init__(self, detector_min_face, min_face_px=None, min_face_fraction=1 / 3,
+                 min_scale=0.1, max_scale=1.0):
+        self.detector_min_face = detector_min_face
+        self.min_face_px = min_face_px
+        self.min_face_fraction = min_face_fraction
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+
+    def min_face(self, shape):
+        return self.min_face_px or shape[0] * self.min_face_fraction
+
+    def scale_for(self, shape):
+        scale = self.detector_min_face / self.min_face(shape)
+        return float(np.clip(scale, self.min_scale, self.max_scale))
+
+
+class SettingStats:
+    def __init__(self):
+        self.ticks = 0
+        self.latency = 0.0
+        self.probes = 0
+        self.found = 0
+        self.reference = 0
+
+    def to_dict(self):
+        return {
+            "ticks": self.ticks,
+            "meanLatencyMs": round(1000 * self.latency / self.ticks, 2) if self.ticks else None,
+            "probes": self.probes,
+            "recall": round(self.found / self.reference, 3) if self.reference else None,
+        }
+
+
+class ScaleTuner:
+    """Per-camera detection scale, optionally auto-tuned.
+
+    Starts at the ResolutionPolicy scale. With `auto`, every `probe_every`
+    ticks the frame is also run through the detector (detection only, no
+    recognition) at the next finer scale, and the faces found there count
+    as the reference for recall at the current scale. probe_frame() takes
+    that input before detection starts, because callers pass borrowed
+    capture-ring views that can be overwritten while detection runs.
+    The tuner then adjusts:
+      - recall below `min_recall` moves one step finer;
+      - after `window` ticks with full recall, if the smallest face seen
+        would still be `headroom` x the detector minimum one step coarser,
+        it moves one step coarser.
+    Latency and recall are recorded for every scale used.
+    """
+
+    def __init__(self, policy, auto=False, probe_every=20, window=100, min_recall=0.95,
+                 headroom=1.5, iou=0.3):
+        self.policy = policy
+        self.auto = auto
+        self.probe_every = probe_every
+        self.window = window
+        self.min_recall = min_recall
+        self.headroom = headroom
+        self.iou = iou
+        self.scale = None
+        self.ticks = 0
+        self.stable_ticks = 0
+        self.smallest_face = None
+        self.settings = {}
+        self.changes = []
+
+    def scale_for(self, shape):
+        if self.scale is None:
+            self.scale = self._snap(self.policy.scale_for(shape))
+            self._setting(self.scale)
+        return self.scale
+
+    def _snap(self, scale):
+        # Keep tuned scales on the ladder so per-setting stats accumulate.
+        return min(SCALES, key=lambda s: abs(s - scale)) if self.auto else scale
+
+    def _setting(self, scale):
+        return self.settings.setdefault(scale, SettingStats())
+
+    def _step(self, direction, reason):
+        index = SCALES.index(self.scale) + direction
+        if not 0 <= index < len(SCALES):
+            return
+        self.changes.append({"from": self.scale, "to": SCALES[index], "reason": reason,
+                             "at": time.time()})
+        self.changes = self.changes[-20:]
+        self.scale = SCALES[index]
+        self._setting(self.scale)
+        self.stable_ticks = 0
+        self.smallest_face = None
+
+    def _probe_scale(self, scale):
+        """Finer scale to probe on the next tick at `scale`, or None."""
+        if not self.auto or scale != self.scale or (self.ticks + 1) % self.probe_every:
+            return None
+        index = SCALES.index(scale)
+        return SCALES[index + 1] if index + 1 < len(SCALES) else None
+
+    def probe_frame(self, sfr, frame, scale):
+        """(finer scale, downscaled RGB copy) if the next tick is probed, else None.
+
+        Call before detecting on `frame` and pass the result to observe().
+        """
+        finer = self._probe_scale(scale)
+        if finer is None:
+            return None
+        return finer, sfr.downscale(frame, finer)
+
+    def observe(self, sfr, scale, latency, face_locations, probe=None):
+        """Record one detection tick at `scale` and tune if enabled."""
+        setting = self._setting(scale)
+        setting.ticks += 1
+        setting.latency += latency
+        self.ticks += 1
+        sizes = [min(b - t, r - l) for t, r, b, l in face_locations]
+        if sizes:
+            smallest = min(sizes)
+            self.smallest_face = smallest if self.smallest_face is None else min(
+                self.smallest_face, smallest)
+        if not self.auto or scale != self.scale:
+            return
+        self.stable_ticks += 1
+        index = SCALES.index(scale)
+        if probe is not None:
+            recall = self._probe(sfr, probe, face_locations, setting)
+            if recall is not None and recall < self.min_recall:
+                self._step(+1, f"recall {recall:.2f}")
+                return
+        if self.stable_ticks >= self.window and index > 0 and self.smallest_face:
+            coarser = SCALES[index - 1]
+            if self.smallest_face * coarser >= self.headroom * self.policy.detector_min_face:
+                self._step(-1, f"smallest face {self.smallest_face}px")
+
+    def _probe(self, sfr, probe, face_locations, setting):
+        finer, rgb = probe
+        reference = sfr.detector.detect(rgb)
+        if not reference:
+            return None
+        reference = (np.asarray(reference, dtype=np.float32) / finer).astype(int)
+        found = 0
+        if len(face_locations):
+            iou = box_iou(face_locations, reference)
+            found = int((iou.max(axis=0) >= self.iou).sum())
+        setting.probes += 1
+        setting.found += found
+        setting.reference += len(reference)
+        return found / len(reference)
+
+    def stats(self):
+        return {
+            "auto": self.auto,
+            "scale": self.scale,
+            "smallestFacePx": self.smallest_face,
+            "settings": {str(scale): s.to_dict() for scale, s in sorted(self.settings.items())},
+            "changes": self.changes,
+        }
+
+
+def tuner_from_env(environ, sfr):
+    """ScaleTuner for DETECTION_SCALE=resolution|auto; None keeps frame_resizing."""
+    mode = environ.get("DETECTION_SCALE", "fixed")
+    if mode not in ("resolution", "auto"):
+        return None
+    min_face_px = environ.get("MIN_FACE_PX")
+    policy = ResolutionPolicy(
+        sfr.detector.min_face,
+        min_face_px=float(min_face_px) if min_face_px else None,
+        min_face_fraction=float(environ.get("MIN_FACE_FRACTION", str(1 / 3))),
+    )
+    return ScaleTuner(policy, auto=mode == "auto")
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: no cross-process locking
+    fcntl = None
+
+
+NO_FACE = -1
+
+
+def content_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+class EncodingCache:
+    """Face encodings keyed by the SHA-1 of the image bytes.
+
+    Stored in a shared directory (the /app/model_data volume) as an
+    append-only `encodings.npy` matrix, memory-mapped on load, plus an
+    `encodings_index.json` mapping content hash -> matrix row (or -1 when the
+    image has no face). Rows are never rewritten, so several camera
+    containers can read and extend the same cache.
+    """
+
+    def __init__(self, directory, name="encodings", dim=128):
+        self.dim = dim
+        self.matrix_path = os.path.join(directory, f"{name}.npy")
+        self.index_path = os.path.join(directory, f"{name}_index.json")
+        self.lock_path = os.path.join(directory, f".{name}.lock")
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        self.index = {}
+        self.matrix = np.empty((0, self.dim), dtype=np.float32)
+        try:
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+            # No matrix yet when every cached image so far had no face.
+            if os.path.exists(self.matrix_path) or any(
+                row != NO_FACE for row in self.index.values()
+            ):
+                self.matrix = np.load(self.matrix_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            if self.index:
+                print("Encoding cache unreadable, starting empty:", e)
+            self.index = {}
+
+    def get(self, digest):
+        """Return (found, encoding); encoding is None for cached no-face images."""
+        row = self.index.get(digest)
+        if row is None or row >= len(self.matrix):
+            if digest in self.pending:
+                self.hits += 1
+                return True, self.pending[digest]
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, None if row == NO_FACE else np.array(self.matrix[row])
+
+    def put(self, digest, encoding):
+        self.pending[digest] = encoding
+
+    def flush(self):
+        if not self.pending:
+            return
+        directory = os.path.dirname(self.matrix_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with open(self.lock_path, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Another container may have appended since we loaded.
+                self._load()
+                new_rows = []
+                for digest, encoding in self.pending.items():
+                    if digest in self.index:
+                        continue
+                    if encoding is None:
+                        self.index[digest] = NO_FACE
+                    else:
+                        self.index[digest] = len(self.matrix) + len(new_rows)
+                        new_rows.append(np.asarray(encoding, dtype=np.float32))
+                if new_rows:
+                    matrix = np.concatenate([self.matrix, np.stack(new_rows)])
+                    tmp = self.matrix_path + ".tmp.npy"
+                    np.save(tmp, matrix)
+                    os.replace(tmp, self.matrix_path)
+                tmp = self.index_path + ".tmp"
+                with open(tmp, "w") as f:
+                    json.dump(self.index, f)
+                os.replace(tmp, self.index_path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        print(f"Encoding cache: {len(self.pending)} new entries saved.")
+        self.pending = {}
+        self._load()
@@ -0,0 +1,135 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import dlib
+import numpy as np
+import face_recognition
+from face_recognition import api as fr_api
+
+
+def batch_face_encodings(items, num_jitters=1):
+    """Encode the faces of several images with one dlib encoder call.
+
+    `items` is a list of (rgb_image, face_locations); returns one list of
+    encodings per item, the same as calling face_recognition.face_encodings
+    on each image.
+    """
+    images, shapes = [], []
+    for rgb_image, face_locations in items:
+        detections = dlib.full_object_detections()
+        for shape in fr_api._raw_face_landmarks(rgb_image, face_locations, "small"):
+            detections.append(shape)
+        images.append(rgb_image)
+        shapes.append(detections)
+    try:
+        batches = fr_api.face_encoder.compute_face_descriptor(
+            images, shapes, num_jitters
+        )
+    except (TypeError, RuntimeError):
+        # dlib builds without the batch overload: encode image by image.
+        return [
+            face_recognition.face_encodings(rgb_image, face_locations, num_jitters)
+            for rgb_image, face_locations in items
+        ]
+    return [[np.array(d) for d in descriptors] for descriptors in batches]
+
+
+class EncodingBatcher:
+    """Collects encoding requests from many frames/cameras into dlib batches.
+
+    A batch is run as soon as it holds `batch_size` faces or the oldest
+    request has waited `max_wait_ms`. Each submit() returns a Future for the
+    list of encodings of that frame. `encode` runs one batch (e.g. in a
+    FaceWorkerPool), with up to `concurrency` batches in flight.
+    """
+
+    def __init__(self, batch_size=16, max_wait_ms=20, encode=batch_face_encodings,
+                 concurrency=1):
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.encode = encode
+        self.runner = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+        self.pending = []
+        self.cond = threading.Condition()
+        self.stopped = False
+        self.stats_lock = threading.Lock()
+        self.batches = 0
+        self.faces = 0
+        self.frames = 0
+        self.max_batch = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    def start(self):
+        threading.Thread(target=self.update, daemon=True).start()
+        return self
+
+    def submit(self, rgb_image, face_locations):
+        future = Future()
+        if len(face_locations) == 0:
+            future.set_result([])
+            return future
+        with self.cond:
+            self.pending.append((time.perf_counter(), rgb_image, face_locations, future))
+            self.cond.notify()
+        return future
+
+    def _pending_faces(self):
+        return sum(len(locations) for _, _, locations, _ in self.pending)
+
+    def update(self):
+        while not self.stopped:
+            with self.cond:
+                while not self.pending and not self.stopped:
+                    self.cond.wait()
+                deadline = self.pending[0][0] + self.max_wait if self.pending else 0
+                while (
+                    not self.stopped
+                    and self._pending_faces() < self.batch_size
+                    and time.perf_counter() < deadline
+                ):
+                    self.cond.wait(deadline - time.perf_counter())
+                batch, self.pending = self.pending, []
+            if batch and self.runner is not None:
+                self.runner.submit(self._run, batch)
+            elif batch:
+                self._run(batch)
+
+    def _run(self, batch):
+        started = time.perf_counter()
+        try:
+            results = self.encode([(img, locs) for _, img, locs, _ in batch])
+        except Exception as e:
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, _, _, future), encodings in zip(batch, results):
+            future.set_result(encodings)
+        n_faces = sum(len(locs) for _, _, locs, _ in batch)
+        waits = [started - submitted for submitted, _, _, _ in batch]
+        with self.stats_lock:
+            self.batches += 1
+            self.frames += len(batch)
+            self.faces += n_faces
+            self.max_batch = max(self.max_batch, n_faces)
+            self.total_wait += sum(waits)
+            self.max_wait_seen = max(self.max_wait_seen, max(waits))
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                "batches": self.batches,
+                "frames": self.frames,
+                "faces": self.faces,
+                "avgBatchFaces": self.faces / self.batches if self.batches else 0.0,
+                "maxBatchFaces": self.max_batch,
+                "avgAddedLatencyMs": (
+                    1000 * self.total_wait / self.frames if self.frames else 0.0
+                ),
+                "maxAddedLatencyMs": 1000 * self.max_wait_seen,
+            }
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
@@ -0,0 +1,153 @@
+import os
+import cv2
+import numpy as np
+
+try:
+    import face_recognition
+except ImportError:  # only the HOG backend needs dlib
+    face_recognition = None
+
+
+# Face detector backends for SimpleFacerec. Every backend takes an RGB image
+# and returns face_recognition-style (top, right, bottom, left) boxes in its
+# pixel coordinates, so recognition and tracking do not care which one ran.
+# `min_face` is roughly the smallest face (in the detector's input pixels)
+# a backend finds reliably; detection policies size the downscale from it.
+# The DNN backends load their model files from MODEL_DIR (default
+# python/models), see the OpenCV Zoo / OpenCV samples for the files.
+
+MODEL_DIR = os.environ.get(
+    "MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+)
+
+
+def _model_path(name):
+    path = os.path.join(MODEL_DIR, name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Face detector model not found: {path}")
+    return path
+
+
+def _to_locations(boxes, shape):
+    """(x, y, w, h) float boxes -> clipped (top, right, bottom, left) ints."""
+    height, width = shape[:2]
+    locations = []
+    for x, y, w, h in boxes:
+        left, top = max(int(x), 0), max(int(y), 0)
+        right, bottom = min(int(x + w), width), min(int(y + h), height)
+        if right > left and bottom > top:
+            locations.append((top, right, bottom, left))
+    return locations
+
+
+class HOGDetector:
+    """dlib HOG + linear SVM via face_recognition; the original detector."""
+
+    name = "hog"
+
+    def __init__(self, upsample=1):
+        self.upsample = upsample
+        # 80x80 sliding window, halved by each upsampling pass.
+        self.min_face = 80 / 2 ** upsample
+
+    def detect(self, rgb):
+        return face_recognition.face_locations(
+            rgb, number_of_times_to_upsample=self.upsample, model="hog"
+        )
+
+
+class YuNetDetector:
+    """OpenCV FaceDetectorYN (YuNet ONNX)."""
+
+    name = "yunet"
+    min_face = 12
+
+    def __init__(self, model="face_detection_yunet_2023mar.onnx", score_threshold=0.6,
+                 nms_threshold=0.3):
+        self.detector = cv2.FaceDetectorYN.create(
+            _model_path(model), "", (320, 320), score_threshold, nms_threshold
+        )
+        self.input_size = None
+
+    def detect(self, rgb):
+        height, width = rgb.shape[:2]
+        if self.input_size != (width, height):
+            self.input_size = (width, height)
+            self.detector.setInputSize(self.input_size)
+        _, faces = self.detector.detect(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+        if faces is None:
+            return []
+        return _to_locations(faces[:, :4], rgb.shape)
+
+
+class SSDDetector:
+    """OpenCV DNN ResNet-10 SSD (res10_300x300).
+
+    Loads the Caffe model by default; OpenCV 5 dropped the Caffe importer,
+    so there pass an ONNX export as `model` with `config=None`.
+    """
+
+    name = "ssd"
+    min_face = 30
+
+    def __init__(self, model="res10_300x300_ssd_iter_140000.caffemodel",
+                 config="deploy.prototxt", confidence=0.5):
+        self.net = cv2.dnn.readNet(
+            _model_path(model), _model_path(config) if config else ""
+        )
+        self.confidence = confidence
+
+    def detect(self, rgb):
+        height, width = rgb.shape[:2]
+        # The model was trained on BGR with these channel means.
+        blob = cv2.dnn.blobFromImage(
+            rgb, 1.0, (300, 300), (123.0, 177.0, 104.0), swapRB=True
+        )
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+        detections = detections[detections[:, 2] >= self.confidence]
+        scale = np.array([width, height, width, height])
+        corners = detections[:, 3:7] * scale
+        boxes = np.column_stack([corners[:, :2], corners[:, 2:] - corners[:, :2]])
+        return _to_locations(boxes, rgb.shape)
+
+
+class MediaPipeDetector:
+    """MediaPipe BlazeFace; model_selection 0 = short range, 1 = full range."""
+
+    name = "mediapipe"
+    min_face = 20
+
+    def __init__(self, model_selection=0, confidence=0.5):
+        # Imported here: mediapipe is heavy and only main_logic2 ships with it.
+        import mediapipe as mp
+
+        self.detector = mp.solutions.face_detection.FaceDetection(
+            model_selection=model_selection, min_detection_confidence=confidence
+        )
+
+    def detect(self, rgb):
+        results = self.detector.process(rgb)
+        if not results.detections:
+            return []
+        height, width = rgb.shape[:2]
+        boxes = []
+        for detection in results.detections:
+            box = detection.location_data.relative_bounding_box
+            boxes.append((box.xmin * width, box.ymin * height,
+                          box.width * width, box.height * height))
+        return _to_locations(boxes, rgb.shape)
+
+
+DETECTORS = {
+    "hog": HOGDetector,
+    "yunet": YuNetDetector,
+    "ssd": SSDDetector,
+    "mediapipe": MediaPipeDetector,
+}
+
+
+def make_detector(kind="hog", **kwargs):
+    if kind not in DETECTORS:
+        raise ValueError(f"Unknown face detector: {kind}")
+    return DETECTORS[kind](**kwargs)
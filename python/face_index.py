@@ -0,0 +1,232 @@
+import numpy as np
+
+
+UNKNOWN = "Unknown"
+
+
+class ExactIndex:
+    """Brute-force gallery kept as one contiguous float32 (N, 128) matrix.
+
+    All query faces are matched against all known faces with a single
+    matrix product, replacing the per-face compare_faces/face_distance scans.
+    """
+
+    def __init__(self, tolerance=0.6, dim=128):
+        self.tolerance = tolerance
+        self.dim = dim
+        self._data = np.empty((0, dim), dtype=np.float32)
+        self._sq_norms = np.empty(0, dtype=np.float32)
+        self._size = 0
+        self.names = []
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def encodings(self):
+        return self._data[: self._size]
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= len(self._data):
+            return
+        capacity = max(needed, 2 * len(self._data), 64)
+        data = np.empty((capacity, self.dim), dtype=np.float32)
+        data[: self._size] = self._data[: self._size]
+        sq_norms = np.empty(capacity, dtype=np.float32)
+        sq_norms[: self._size] = self._sq_norms[: self._size]
+        self._data, self._sq_norms = data, sq_norms
+
+    def add(self, encodings, names):
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if len(encodings) != len(names):
+            raise ValueError("encodings and names must have the same length")
+        self._reserve(len(encodings))
+        end = self._size + len(encodings)
+        self._data[self._size : end] = encodings
+        self._sq_norms[self._size : end] = np.einsum("ij,ij->i", encodings, encodings)
+        self._size = end
+        self.names.extend(names)
+
+    def remove(self, names):
+        """Drop every encoding enrolled under one of `names`; return the count."""
+        names = set(names)
+        keep = np.array([name not in names for name in self.names], dtype=bool)
+        removed = int(self._size - keep.sum())
+        if removed == 0:
+            return 0
+        kept = self._size - removed
+        self._data[:kept] = self._data[: self._size][keep]
+        self._sq_norms[:kept] = self._sq_norms[: self._size][keep]
+        self._size = kept
+        self.names = [name for name, k in zip(self.names, keep) if k]
+        return removed
+
+    def _sq_distances(self, queries):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        q_sq = np.einsum("ij,ij->i", queries, queries)
+        d2 = q_sq[:, None] + self._sq_norms[None, : self._size]
+        d2 -= 2.0 * (queries @ self.encodings.T)
+        np.maximum(d2, 0.0, out=d2)
+        return d2
+
+    def distances(self, queries):
+        """Euclidean distance matrix of shape (len(queries), len(self))."""
+        return np.sqrt(self._sq_distances(queries))
+
+    def nearest(self, queries):
+        """Return (row, distance) arrays of the closest gallery entry per query."""
+        d2 = self._sq_distances(queries)
+        best = np.argmin(d2, axis=1)
+        return best, np.sqrt(d2[np.arange(len(best)), best])
+
+    def match(self, queries):
+        """Return (names, distances) of the nearest known face for each query.
+
+        Queries whose nearest distance is above the tolerance (or any query
+        against an empty gallery) are reported as "Unknown".
+        """
+        n_queries = len(queries)
+        if n_queries == 0:
+            return [], []
+        if self._size == 0:
+            return [UNKNOWN] * n_queries, [float("inf")] * n_queries
+        best, best_dist = self.nearest(queries)
+        hits = best_dist <= self.tolerance
+        names = [
+            self.names[idx] if hit else UNKNOWN for idx, hit in zip(best, hits)
+        ]
+        return names, best_dist.tolist()
+
+
+class IVFIndex:
+    """Inverted-file approximate index for large galleries.
+
+    Encodings are clustered with k-means into `nlist` cells, each cell being a
+    small ExactIndex. A query is only compared with the members of its
+    `nprobe` closest cells. Until the gallery reaches `min_train_size` the
+    index behaves exactly like ExactIndex (a single cell), and it re-clusters
+    itself whenever the gallery has doubled since the last training.
+    """
+
+    def __init__(
+        self, tolerance=0.6, dim=128, nlist=None, nprobe=8, min_train_size=1024,
+        kmeans_iters=10, seed=0,
+    ):
+        self.tolerance = tolerance
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.kmeans_iters = kmeans_iters
+        self.rng = np.random.default_rng(seed)
+        self.centroids = None
+        self._coarse = None
+        self.cells = [ExactIndex(tolerance, dim)]
+        self._trained_size = 0
+
+    def __len__(self):
+        return sum(len(cell) for cell in self.cells)
+
+    @property
+    def encodings(self):
+        return np.concatenate([cell.encodings for cell in self.cells])
+
+    @property
+    def names(self):
+        return [name for cell in self.cells for name in cell.names]
+
+    def _set_centroids(self, centroids):
+        self.centroids = centroids
+        self._coarse = ExactIndex(dim=self.dim)
+        self._coarse.add(centroids, [None] * len(centroids))
+
+    def _assign(self, encodings):
+        return self._coarse.nearest(encodings)[0]
+
+    def train(self):
+        encodings, names = self.encodings, self.names
+        n = len(encodings)
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        if nlist < 2:
+            return
+        centroids = encodings[self.rng.choice(n, nlist, replace=False)]
+        for _ in range(self.kmeans_iters):
+            self._set_centroids(centroids)
+            labels = self._assign(encodings)
+            counts = np.bincount(labels, minlength=nlist)
+            sums = np.zeros((nlist, self.dim), dtype=np.float64)
+            np.add.at(sums, labels, encodings)
+            centroids = centroids.copy()
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+        self._set_centroids(centroids)
+        labels = self._assign(encodings)
+        self.cells = [ExactIndex(self.tolerance, self.dim) for _ in range(nlist)]
+        for cell_id, cell in enumerate(self.cells):
+            rows = np.flatnonzero(labels == cell_id)
+            cell.add(encodings[rows], [names[i] for i in rows])
+        self._trained_size = n
+
+    def add(self, encodings, names):
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        if len(encodings) != len(names):
+            raise ValueError("encodings and names must have the same length")
+        if self.centroids is None:
+            self.cells[0].add(encodings, names)
+        else:
+            labels = self._assign(encodings)
+            for cell_id in np.unique(labels):
+                rows = np.flatnonzero(labels == cell_id)
+                self.cells[cell_id].add(encodings[rows], [names[i] for i in rows])
+        size = len(self)
+        if size >= self.min_train_size and size >= 2 * self._trained_size:
+            self.train()
+
+    def remove(self, names):
+        names = set(names)
+        return sum(cell.remove(names) for cell in self.cells)
+
+    def match(self, queries):
+        n_queries = len(queries)
+        if n_queries == 0:
+            return [], []
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        best_dist = np.full(n_queries, np.inf)
+        best_cell = np.zeros(n_queries, dtype=int)
+        best_row = np.zeros(n_queries, dtype=int)
+        if self.centroids is None:
+            probes = np.zeros((n_queries, 1), dtype=int)
+        else:
+            nprobe = min(self.nprobe, len(self.centroids))
+            coarse = self._coarse.distances(queries)
+            probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+        for cell_id in np.unique(probes):
+            cell = self.cells[cell_id]
+            if len(cell) == 0:
+                continue
+            rows = np.flatnonzero((probes == cell_id).any(axis=1))
+            idx, dist = cell.nearest(queries[rows])
+            better = dist < best_dist[rows]
+            rows = rows[better]
+            best_dist[rows] = dist[better]
+            best_cell[rows] = cell_id
+            best_row[rows] = idx[better]
+        names = [
+            self.cells[cell_id].names[i] if d <= self.tolerance else UNKNOWN
+            for cell_id, i, d in zip(best_cell, best_row, best_dist)
+        ]
+        return names, best_dist.tolist()
+
+
+INDEXES = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+}
+
+
+def make_index(kind="exact", **kwargs):
+    if kind not in INDEXES:
+        raise ValueError(f"Unknown gallery index: {kind}")
+    return INDEXES[kind](**kwargs)
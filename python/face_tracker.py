@@ -0,0 +1,118 @@
+import itertools
+import numpy as np
+
+
+def box_iou(boxes_a, boxes_b):
+    """IoU matrix between two lists of (top, right, bottom, left) boxes."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    top = np.maximum(a[:, None, 0], b[None, :, 0])
+    right = np.minimum(a[:, None, 1], b[None, :, 1])
+    bottom = np.minimum(a[:, None, 2], b[None, :, 2])
+    left = np.maximum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    area_a = (a[:, 1] - a[:, 3]) * (a[:, 2] - a[:, 0])
+    area_b = (b[:, 1] - b[:, 3]) * (b[:, 2] - b[:, 0])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.name = None
+        self.distance = None
+        self.confidence = 0.0
+        self.missed = 0
+
+
+class FaceTracker:
+    """IoU tracker carrying recognized identities between detection ticks.
+
+    Every tick's face boxes are greedily associated with the previous tick's
+    tracks. A track's confidence decays each tick it is carried forward;
+    a face is re-encoded only when its track is new, was re-acquired after
+    being lost, or its confidence dropped below `min_confidence`.
+    """
+
+    def __init__(
+        self, iou_threshold=0.3, max_missed=2, decay=0.9, min_confidence=0.5,
+        unknown_confidence=0.6,
+    ):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.decay = decay
+        self.min_confidence = min_confidence
+        self.unknown_confidence = unknown_confidence
+        self.tracks = []
+        self._ids = itertools.count(1)
+        self.faces_seen = 0
+        self.faces_encoded = 0
+
+    def update(self, boxes):
+        """Associate `boxes` with tracks; returns the track for each box."""
+        assigned = [None] * len(boxes)
+        matched = set()
+        if self.tracks and len(boxes):
+            iou = box_iou([t.box for t in self.tracks], boxes)
+            for flat in np.argsort(iou, axis=None)[::-1]:
+                t, b = np.unravel_index(flat, iou.shape)
+                if iou[t, b] < self.iou_threshold:
+                    break
+                if assigned[b] is not None or t in matched:
+                    continue
+                matched.add(t)
+                assigned[b] = self.tracks[t]
+
+        survivors = []
+        for t, track in enumerate(self.tracks):
+            if t in matched:
+                track.missed = 0
+                track.confidence *= self.decay
+                survivors.append(track)
+                continue
+            track.missed += 1
+            if track.missed <= self.max_missed:
+                # A track that lost its face must be re-checked when it is
+                # picked up again.
+                track.confidence = 0.0
+                survivors.append(track)
+        for b, box in enumerate(boxes):
+            if assigned[b] is None:
+                assigned[b] = Track(next(self._ids), box)
+                survivors.append(assigned[b])
+            assigned[b].box = box
+        self.tracks = survivors
+        self.faces_seen += len(boxes)
+        return assigned
+
+    def needs_recognition(self, track):
+        return track.name is None or track.confidence < self.min_confidence
+
+    def set_identity(self, track, name, distance):
+        self.faces_encoded += 1
+        track.name = name
+        track.distance = distance
+        track.confidence = 1.0 if name != "Unknown" else self.unknown_confidence
+
+    def refresh_identities(self, known):
+        """After a gallery change: re-recognize tracks on the next tick.
+
+        Tracks named after someone no longer in `known` lose the name, and
+        "Unknown" tracks are re-checked in case they were just enrolled.
+        """
+        for track in list(self.tracks):
+            if track.name == "Unknown":
+                track.confidence = 0.0
+            elif track.name is not None and track.name not in known:
+                track.name = None
+                track.confidence = 0.0
+
+    def stats(self):
+        return {
+            "tracks": len(self.tracks),
+            "facesSeen": self.faces_seen,
+            "facesEncoded": self.faces_encoded,
+            "encodingsSkipped": self.faces_seen - self.faces_encoded,
+        }
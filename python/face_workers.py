@@ -0,0 +1,135 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from face_batcher import batch_face_encodings
+from face_detectors import make_detector
+
+
+# dlib's Python bindings (HOG detection, face descriptors) hold the GIL, so
+# multi_stream's detection threads would share about one core between all
+# cameras. FaceWorkerPool runs that dlib work in spawned worker processes,
+# each with its own detector and dlib models. Frames are sent downscaled
+# (640x480 at 0.25 is 57 KB), which is cheap next to the detection itself.
+# Workers return their own CPU time so the host can report cores used.
+
+_detector = None
+
+
+def _init_worker(kind, kwargs):
+    global _detector
+    _detector = make_detector(kind, **kwargs)
+
+
+def _detect(rgb):
+    start = time.process_time()
+    locations = _detector.detect(rgb)
+    return locations, time.process_time() - start
+
+
+def _encode(items):
+    start = time.process_time()
+    encodings = batch_face_encodings(items)
+    return encodings, time.process_time() - start
+
+
+class PooledDetector:
+    """Detector backend stand-in that detects in a FaceWorkerPool."""
+
+    def __init__(self, pool, local):
+        self.pool = pool
+        self.name = local.name
+        self.min_face = local.min_face
+
+    def detect(self, rgb):
+        return self.pool.detect(rgb)
+
+
+class FaceWorkerPool:
+    """Process pool for face detection and encoding.
+
+    attach() points a SimpleFacerec at the pool: its detector becomes a
+    PooledDetector, and without an EncodingBatcher the pool also takes the
+    batcher's place (submit() returns a Future of one frame's encodings).
+    """
+
+    def __init__(self, workers, detector="hog", detector_kwargs=None):
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(detector, detector_kwargs or {}),
+        )
+        self.lock = threading.Lock()
+        self.cpu = 0.0
+        self.detections = 0
+        self.encodings = 0
+
+    def _submit(self, fn, *args):
+        """Run fn in a worker; the Future resolves to its result, CPU time counted."""
+        future = Future()
+
+        def done(remote):
+            try:
+                result, cpu = remote.result()
+            except Exception as e:
+                future.set_exception(e)
+                return
+            with self.lock:
+                self.cpu += cpu
+            future.set_result(result)
+
+        self.executor.submit(fn, *args).add_done_callback(done)
+        return future
+
+    def detect(self, rgb):
+        with self.lock:
+            self.detections += 1
+        return self._submit(_detect, rgb).result()
+
+    def encode_batch(self, items):
+        """batch_face_encodings in a worker; `items` is [(rgb, locations), ...]."""
+        with self.lock:
+            self.encodings += 1
+        return self._submit(_encode, items).result()
+
+    def submit(self, rgb_image, face_locations):
+        future = Future()
+        if len(face_locations) == 0:
+            future.set_result([])
+            return future
+        with self.lock:
+            self.encodings += 1
+        remote = self._submit(_encode, [(rgb_image, face_locations)])
+
+        def done(remote):
+            if remote.exception() is not None:
+                future.set_exception(remote.exception())
+            else:
+                future.set_result(remote.result()[0])
+
+        remote.add_done_callback(done)
+        return future
+
+    def attach(self, sfr):
+        sfr.detector = PooledDetector(self, sfr.detector)
+        if sfr.batcher is None:
+            sfr.batcher = self
+        return self
+
+    def cpu_seconds(self):
+        with self.lock:
+            return self.cpu
+
+    def stats(self):
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "detections": self.detections,
+                "encodeCalls": self.encodings,
+                "cpuSec": round(self.cpu, 2),
+            }
+
+    def stop(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,67 @@
+import json
+import os
+import threading
+import time
+
+
+class GalleryWatcher:
+    """Keeps a SimpleFacerec gallery in sync with its model_data JSON feed.
+
+    The worker-server rewrites `<room>-<camera>.json` when employees change;
+    `reload()` (called from the polling thread or the /gallery/reload route)
+    re-reads it and applies only the difference, without restarting capture.
+    """
+
+    def __init__(
+        self, face_rec, feed_path, emps, cache_dir=None, workers=1,
+        on_update=None, poll_sec=2.0,
+    ):
+        self.face_rec = face_rec
+        self.feed_path = feed_path
+        self.emps = emps
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.on_update = on_update
+        self.poll_sec = poll_sec
+        self.lock = threading.Lock()
+        self.stopped = False
+        self.mtime = self._mtime()
+
+    def _mtime(self):
+        try:
+            return os.stat(self.feed_path).st_mtime
+        except OSError:
+            return None
+
+    def reload(self):
+        with self.lock:
+            mtime = self._mtime()
+            with open(self.feed_path, "r") as f:
+                new_emps = json.load(f)
+            summary = self.face_rec.update_gallery(
+                self.emps, new_emps, self.cache_dir, self.workers
+            )
+            self.emps = new_emps
+            self.mtime = mtime
+        if self.on_update is not None:
+            self.on_update(new_emps)
+        return summary
+
+    def start(self):
+        if self.poll_sec > 0:
+            threading.Thread(target=self.update, daemon=True).start()
+        return self
+
+    def update(self):
+        while not self.stopped:
+            time.sleep(self.poll_sec)
+            if self._mtime() == self.mtime:
+                continue
+            try:
+                self.reload()
+            except (OSError, ValueError) as e:
+                # The feed may be mid-write; retry on the next poll.
+                print("Gallery reload failed:", e)
+
+    def stop(self):
+        self.stopped = True
@@ -0,0 +1,79 @@
+import json
+import threading
+import time
+
+
+class HeadroomMeter:
+    """Measures how much faster than the camera a processing loop could run.
+
+    The loop calls record() with the time it spent on each frame it handled
+    (waiting for frames does not count). report() compares that work rate
+    with the capture rate over the interval since the previous report:
+    `headroom` 3.0 means the loop could keep up with a camera three times
+    as fast, and `busyFraction` is the share of one core it used.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+        self.last = (time.time(), 0, 0.0, 0)
+
+    def record(self, seconds):
+        with self.lock:
+            self.frames += 1
+            self.busy += seconds
+
+    def report(self, captured, now=None):
+        """Rates since the previous report; `captured` is the capture frame count."""
+        now = time.time() if now is None else now
+        with self.lock:
+            frames, busy = self.frames, self.busy
+        last_time, last_frames, last_busy, last_captured = self.last
+        self.last = (now, frames, busy, captured)
+        elapsed = max(now - last_time, 1e-6)
+        frames -= last_frames
+        busy -= last_busy
+        capture_fps = (captured - last_captured) / elapsed
+        max_fps = frames / busy if busy > 0 else None
+        return {
+            "captureFps": round(capture_fps, 2),
+            "processedFps": round(frames / elapsed, 2),
+            "busyFraction": round(busy / elapsed, 3),
+            "maxFps": round(max_fps, 2) if max_fps else None,
+            "headroom": round(max_fps / capture_fps, 2) if max_fps and capture_fps else None,
+        }
+
+
+class CpuMeter:
+    """Cores used since the previous report: this process's CPU time plus
+    `extra()` seconds, e.g. the CPU time of worker processes.
+
+    Unlike busyFraction, which is wall time spent on frames, this does not
+    count threads that are only waiting for the GIL.
+    """
+
+    def __init__(self, extra=None):
+        self.extra = extra
+        self.last = (time.time(), self._cpu())
+
+    def _cpu(self):
+        return time.process_time() + (self.extra() if self.extra is not None else 0.0)
+
+    def report(self, now=None):
+        now = time.time() if now is None else now
+        cpu = self._cpu()
+        last_time, last_cpu = self.last
+        self.last = (now, cpu)
+        return round((cpu - last_cpu) / max(now - last_time, 1e-6), 3)
+
+
+def headless_enabled(environ):
+    return environ.get("HEADLESS", "0") == "1"
+
+
+def report_headroom(report, interval_sec):
+    """Print `report()` every interval, forever; the main loop in headless mode."""
+    while True:
+        time.sleep(interval_sec)
+        print("Headroom:", json.dumps(report()), flush=True)
@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+from camera_codec import make_encoder
+
+try:
+    from confluent_kafka import KafkaException, Producer
+except ImportError:  # stdout reporting still works without the Kafka client
+    Producer = None
+
+
+TOPIC = "camera-job"
+
+
+def message_key(face_data):
+    # Same key for every record of a camera: they land on one partition, in order.
+    return f"{face_data['roomId']}:{face_data['cameraId']}"
+
+
+class StdoutReporter:
+    """The original transport: one JSON line per record on stdout."""
+
+    name = "stdout"
+
+    def __init__(self):
+        self.sent = 0
+
+    def send(self, face_data):
+        print(json.dumps(face_data), flush=True)
+        self.sent += 1
+
+    def stats(self):
+        return {"transport": self.name, "sent": self.sent}
+
+    def close(self, timeout=5.0):
+        pass
+
+
+class KafkaReporter:
+    """Batched, compressed producer for camera records.
+
+    librdkafka batches records for `linger_ms` and compresses each batch.
+    The default is gzip because the camera-job consumer is kafkajs, which
+    only decodes gzip without an extra codec package.
+    While the broker is unreachable, records wait in its local queue. The
+    queue is capped at `max_buffer` records and expires them after
+    `message_timeout_ms`. When the queue is full, new records are dropped
+    and counted; each record is a full snapshot of the camera, so the next
+    one supersedes it anyway.
+    """
+
+    name = "kafka"
+
+    def __init__(
+        self, brokers, topic=TOPIC, linger_ms=50, batch_size=64 * 1024,
+        compression="gzip", max_buffer=10000, message_timeout_ms=60000,
+        encoding="json", producer=None,
+    ):
+        self.topic = topic
+        self.encoding = encoding
+        self.encode = make_encoder(encoding)
+        self.config = {
+            "bootstrap.servers": brokers,
+            "client.id": "model-py",
+            "linger.ms": linger_ms,
+            "batch.size": batch_size,
+            "compression.type": compression,
+            "queue.buffering.max.messages": max_buffer,
+            "message.timeout.ms": message_timeout_ms,
+            "acks": "1",
+        }
+        # `producer` lets tests or a stand-in broker client replace librdkafka.
+        self.producer = producer if producer is not None else Producer(self.config)
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.bytes_queued = 0
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.last_error = None
+        self.last_error_logged = 0.0
+        self.latency = 0.0
+
+    def _on_delivery(self, err, msg, queued_at):
+        with self.lock:
+            if err is not None:
+                self.failed += 1
+                self.last_error = str(err)
+            else:
+                self.delivered += 1
+                self.latency += 0.2 * (time.time() - queued_at - self.latency)
+        if err is not None and time.time() - self.last_error_logged > 10:
+            self.last_error_logged = time.time()
+            print("Kafka delivery failed:", err, flush=True)
+
+    def send(self, face_data):
+        value = self.encode(face_data)
+        queued_at = time.time()
+        try:
+            self.producer.produce(
+                self.topic,
+                key=message_key(face_data).encode(),
+                value=value,
+                on_delivery=lambda err, msg: self._on_delivery(err, msg, queued_at),
+            )
+            with self.lock:
+                self.queued += 1
+                self.bytes_queued += len(value)
+        except BufferError:
+            with self.lock:
+                self.dropped += 1
+        # Serve delivery callbacks of earlier records without blocking.
+        self.producer.poll(0)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "transport": self.name,
+                "topic": self.topic,
+                "encoding": self.encoding,
+                "queued": self.queued,
+                "bytesQueued": self.bytes_queued,
+                "delivered": self.delivered,
+                "failed": self.failed,
+                "droppedBufferFull": self.dropped,
+                "inFlight": len(self.producer),
+                "deliveryLatencyMs": round(1000 * self.latency, 1),
+                "lastError": self.last_error,
+            }
+
+    def close(self, timeout=5.0):
+        """Wait up to `timeout` seconds for buffered records to be delivered."""
+        return self.producer.flush(timeout)
+
+
+def make_reporter(brokers, environ):
+    """KafkaReporter for `brokers`, or stdout if no broker/client is available."""
+    if not brokers or environ.get("REPORT_TRANSPORT", "kafka") == "stdout":
+        return StdoutReporter()
+    if Producer is None:
+        print("confluent_kafka not installed, reporting on stdout.")
+        return StdoutReporter()
+    try:
+        return KafkaReporter(
+            brokers,
+            topic=environ.get("KAFKA_TOPIC", TOPIC),
+            linger_ms=int(environ.get("KAFKA_LINGER_MS", "50")),
+            batch_size=int(environ.get("KAFKA_BATCH_BYTES", str(64 * 1024))),
+            compression=environ.get("KAFKA_COMPRESSION", "gzip"),
+            max_buffer=int(environ.get("KAFKA_MAX_BUFFER", "10000")),
+            message_timeout_ms=int(environ.get("KAFKA_MESSAGE_TIMEOUT_MS", "60000")),
+            encoding=environ.get("REPORT_ENCODING", "json"),
+        )
+    except KafkaException as e:
+        print("Kafka producer unavailable, reporting on stdout:", e)
+        return StdoutReporter()
@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import time
+import aiohttp
+import numpy as np
+
+
+# Opens N concurrent /video_feed viewers against a running camera process
+# (Flask or STREAM_SERVER=async) and reports delivered frames per second and
+# delivery lag percentiles as the viewer count grows. Lag is measured from
+# the X-Timestamp part header, the time the encoded JPEG was published, so
+# it covers fan-out, queueing and network only, not capture, inference or
+# encoding (see /stats latency for those). Run it on the camera's host.
+
+
+async def viewer(session, url, duration, lags, counts, index):
+    deadline = time.time() + duration
+    buffer = b""
+    frames = 0
+    try:
+        async with session.get(url) as response:
+            async for chunk in response.content.iter_any():
+                buffer += chunk
+                while True:
+                    start = buffer.find(b"--frame\r\n")
+                    header_end = buffer.find(b"\r\n\r\n", start)
+                    if start < 0 or header_end < 0:
+                        break
+                    headers = buffer[start:header_end].split(b"\r\n")
+                    timestamp = None
+                    length = 0
+                    for header in headers:
+                        name, _, value = header.partition(b":")
+                        if name == b"X-Timestamp":
+                            timestamp = float(value)
+                        elif name == b"Content-Length":
+                            length = int(value)
+                    end = header_end + 4 + length
+                    if len(buffer) < end:
+                        break
+                    buffer = buffer[end:]
+                    frames += 1
+                    if timestamp is not None:
+                        lags.append(time.time() - timestamp)
+                if time.time() >= deadline:
+                    break
+    except aiohttp.ClientError as e:
+        print(f"viewer {index} failed:", e)
+    counts[index] = frames
+
+
+async def run_level(url, viewers, duration):
+    lags = []
+    counts = [0] * viewers
+    timeout = aiohttp.ClientTimeout(total=duration + 10)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        await asyncio.gather(
+            *(viewer(session, url, duration, lags, counts, i) for i in range(viewers))
+        )
+    return counts, lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MJPEG /video_feed load test")
+    parser.add_argument("--url", default="http://localhost:5222/video_feed")
+    parser.add_argument("--viewers", default="1,5,10,25,50")
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(
+        f"{'viewers':>7} {'fps/viewer':>10} {'total fps':>9} "
+        f"{'lag p50 ms':>10} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for level in map(int, args.viewers.split(",")):
+        counts, lags = asyncio.run(run_level(args.url, level, args.duration))
+        fps = np.array(counts) / args.duration
+        if lags:
+            p50, p95, p99 = 1000 * np.percentile(lags, [50, 95, 99])
+        else:
+            p50 = p95 = p99 = float("nan")
+        print(
+            f"{level:>7} {fps.mean():>10.1f} {fps.sum():>9.1f} "
+            f"{p50:>10.1f} {p95:>8.1f} {p99:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,146 +1,221 @@
-from flask import Flask, render_template_string, Response
+from flask import Flask, render_template_string, Response, abort, jsonify, request
 import cv2
-import mediapipe as mp
 import simple_facerec2 as sfr
+from gallery_watcher import GalleryWatcher
+from kafka_reporter import StdoutReporter, make_reporter
+from camera_events import events_from_env
+from roi import roi_from_env
+from detection_policy import tuner_from_env
+from headless import HeadroomMeter, headless_enabled, report_headroom
+from face_tracker import FaceTracker
+from motion_gate import gate_from_env
+from scheduler import scheduler_from_env
+from video_stream import VideoCaptureThread, capture_from_env, reconnect_from_env
+from pipeline import InferenceResults, LatencyBreakdown, ResultStore
+from stream_profiles import CanvasRing, streams_from_env
 import threading
 import time
 import json
 import sys
+import os
+import atexit
 
 app = Flask(__name__)
 
-face_rec = sfr.SimpleFacerec()
-
 c = {}
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
-pose_detector = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5, model_complexity=1)
-
 face_rec_interval = 10       
 motion_update_interval = 30  
 motion_threshold = 5
 
-last_face_locations = []
-last_face_names = []
-last_motion_state1 = "Idle"
-
-class VideoCaptureThread:
-    def __init__(self, src="http://192.168.1.7:4747/video", width=640, height=480):
-        self.cap = cv2.VideoCapture(src)
-        self.cap.set(3, width)
-        self.cap.set(4, height)
-        self.frame = None
-        self.stopped = False
-        self.lock = threading.Lock()
-
-    def start(self):
-        t = threading.Thread(target=self.update, daemon=True)
-        t.start()
-        return self
-
-    def update(self):
-        while not self.stopped:
-            ret, frame = self.cap.read()
-            if not ret:
-                self.stop()
-                return
-            with self.lock:
-                self.frame = frame
-
-    def read(self):
-        with self.lock:
-            return self.frame.copy() if self.frame is not None else None
-
-    def stop(self):
-        self.stopped = True
-        self.cap.release()
-    
-    def lock(self):
-        return self.lock
-
-
-def detection_worker(video_stream, detection_interval=0.5):
-    global last_face_locations, last_face_names
-    while True:
-        frame = video_stream.read()
-        if frame is None:
-            print("in")
-            time.sleep(detection_interval)
-            continue
-        face_locations, face_names = face_rec.detect_known_faces(frame.copy())
-        last_face_locations = face_locations
-        last_face_names = face_names
-        time.sleep(detection_interval)
-
-
-def process_frame(frame, frame_idx, prev_pose_landmarks, motion_buffer, last_motion_state):
-    frame = cv2.flip(frame, 1)
-
-    global last_face_locations, last_face_names
-    if frame_idx % face_rec_interval == 0:
-        last_face_locations, last_face_names = face_rec.detect_known_faces(frame)
-    if len(last_face_locations) > 0:
-        for (top, right, bottom, left), name in zip(last_face_locations, last_face_names):
-            cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-            if name == "Unknown":
-                cv2.putText(frame, name, (left, top - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+result_store = ResultStore()
+latency = LatencyBreakdown()
+headroom_meter = HeadroomMeter()
+reporter = StdoutReporter()
+gallery_watcher = None
+# Built by init_pipeline().
+face_rec = None
+mp_pose = None
+mp_drawing = None
+pose_detector = None
+events = None
+face_tracker = None
+face_gate = None
+pose_gate = None
+recognition_scheduler = None
+roi_planner = None
+scale_tuner = None
+streams = None
+# MediaPipe pose landmarks 0-10 are the nose, eyes, ears and mouth.
+HEAD_LANDMARKS = slice(0, 11)
+
+
+def recognition_due(frame_idx):
+    if recognition_scheduler is not None:
+        return recognition_scheduler.due()
+    return frame_idx % face_rec_interval == 0
+
+
+def infer_frame(frame, frame_idx, prev_results, prev_pose_landmarks, motion_buffer, last_motion_state):
+    """Run the gated face and pose models on one mirrored frame."""
+    face_locations = prev_results.face_locations
+    face_names = prev_results.face_names
+    pose_landmarks = prev_results.pose_landmarks
+    run_pose = pose_gate is None or pose_gate.should_process(frame)
+    if recognition_due(frame_idx):
+        if face_gate is not None and not face_gate.should_process(frame):
+            if recognition_scheduler is not None:
+                recognition_scheduler.skip()
+        else:
+            start = time.perf_counter()
+            scale = scale_tuner.scale_for(frame.shape) if scale_tuner is not None else None
+            rois = None
+            if roi_planner is not None:
+                heads = [prev_pose_landmarks[HEAD_LANDMARKS]] if prev_pose_landmarks else []
+                rois = roi_planner.plan(frame.shape, face_locations, heads, full_resize=scale)
+            probe = None
+            if scale_tuner is not None and rois is None:
+                probe = scale_tuner.probe_frame(face_rec, frame, scale)
+            if face_tracker is not None:
+                face_locations, face_names = face_rec.track_known_faces(
+                    frame, face_tracker, rois, scale)
             else:
-                cv2.putText(frame, c[name]["empName"], (left, top - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-    head_count = len(last_face_locations)
-    cv2.putText(frame, f"Head Count: {head_count}", (10, 70),
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 2)
+                face_locations, face_names = face_rec.detect_known_faces(frame, rois, scale)
+            elapsed = time.perf_counter() - start
+            if scale_tuner is not None and rois is None:
+                scale_tuner.observe(face_rec, scale, elapsed, face_locations, probe)
+            latency.record("faceRecognition", elapsed)
+            if recognition_scheduler is not None:
+                recognition_scheduler.record(elapsed, len(face_locations), last_motion_state == "Moving")
 
-    imageRGB = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = pose_detector.process(imageRGB)
-    curr_pose_landmarks = None
+    # Static scene: keep the last pose and report no motion.
+    curr_pose_landmarks = prev_pose_landmarks
     current_motion = 0
-
-    if results.pose_landmarks:
-        mp_drawing.draw_landmarks(frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-        h, w, _ = frame.shape
-        curr_pose_landmarks = []
-        for landmark in results.pose_landmarks.landmark:
-            curr_pose_landmarks.append((int(landmark.x * w), int(landmark.y * h), landmark.z * w))
-        if prev_pose_landmarks is not None and len(prev_pose_landmarks) == len(curr_pose_landmarks):
-            current_motion = sum(
-                (((curr[0] - prev[0])**2 + (curr[1] - prev[1])**2)**0.5)
-                for prev, curr in zip(prev_pose_landmarks, curr_pose_landmarks)
-            ) / len(curr_pose_landmarks)
+    if run_pose:
+        start = time.perf_counter()
+        imageRGB = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        results = pose_detector.process(imageRGB)
+        latency.record("pose", time.perf_counter() - start)
+        pose_landmarks = results.pose_landmarks
+        curr_pose_landmarks = None
+        if results.pose_landmarks:
+            h, w, _ = frame.shape
+            curr_pose_landmarks = []
+            for landmark in results.pose_landmarks.landmark:
+                curr_pose_landmarks.append((int(landmark.x * w), int(landmark.y * h), landmark.z * w))
+            if prev_pose_landmarks is not None and len(prev_pose_landmarks) == len(curr_pose_landmarks):
+                current_motion = sum(
+                    (((curr[0] - prev[0])**2 + (curr[1] - prev[1])**2)**0.5)
+                    for prev, curr in zip(prev_pose_landmarks, curr_pose_landmarks)
+                ) / len(curr_pose_landmarks)
 
     motion_buffer.append(current_motion)
     if frame_idx % motion_update_interval == 0 and motion_buffer:
         avg_motion = sum(motion_buffer) / len(motion_buffer)
         last_motion_state = "Moving" if avg_motion > motion_threshold else "Idle"
         motion_buffer.clear()
-    global last_motion_state1
-    last_motion_state1 = last_motion_state
-    cv2.putText(frame, f"State: {last_motion_state}", (10, 30),
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
 
-    return frame, curr_pose_landmarks, motion_buffer, last_motion_state
+    results = InferenceResults(face_locations, face_names, pose_landmarks, last_motion_state)
+    return results, curr_pose_landmarks, motion_buffer, last_motion_state
 
-def gen_frames():
+
+def inference_worker():
+    """Runs the models on the newest captured frame, whether or not anyone watches."""
     frame_idx = 0
     prev_pose_landmarks = None
     motion_buffer = []
     last_motion_state = "Idle"
-    while True and video_thread != None:
-        frame = video_thread.read()
+    last_seq = 0
+    mirrored = None
+    while not video_thread.stopped:
+        seq, frame = video_thread.read_newer(last_seq, timeout=1.0)
         if frame is None:
-            time.sleep(0.01)
             continue
+        last_seq = seq
+        start = time.time()
+        captured_at = video_thread.ring.captured_at(seq)
+        if captured_at is not None:
+            latency.record("captureToInference", start - captured_at)
+        # The capture ring hands out read-only views; mirror into our own buffer.
+        mirrored = cv2.flip(frame, 1, mirrored)
         frame_idx += 1
-        frame, curr_pose_landmarks, motion_buffer, last_motion_state = process_frame(
-            frame, frame_idx, prev_pose_landmarks, motion_buffer, last_motion_state)
-        prev_pose_landmarks = curr_pose_landmarks
-        ret, buffer = cv2.imencode('.jpg', frame)
-        if not ret:
+        results, prev_pose_landmarks, motion_buffer, last_motion_state = infer_frame(
+            mirrored, frame_idx, result_store.latest(), prev_pose_landmarks, motion_buffer, last_motion_state)
+        results.frame_seq = seq
+        results.captured_at = captured_at
+        results.completed_at = time.time()
+        latency.record("inference", results.completed_at - start)
+        if captured_at is not None:
+            latency.record("captureToResult", results.completed_at - captured_at)
+        headroom_meter.record(results.completed_at - start)
+        result_store.publish(results)
+
+
+def draw_results(frame, results):
+    for (top, right, bottom, left), name in zip(results.face_locations, results.face_names):
+        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
+        if name == "Unknown":
+            cv2.putText(frame, name, (left, top - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+        else:
+            cv2.putText(frame, c[name]["empName"] if name in c else name, (left, top - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+    head_count = len(results.face_locations)
+    cv2.putText(frame, f"Head Count: {head_count}", (10, 70),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 2)
+    if results.pose_landmarks:
+        mp_drawing.draw_landmarks(frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
+    cv2.putText(frame, f"State: {results.motion_state}", (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+
+
+def gen_frames():
+    """Capture-rate annotated frames, drawn from the latest inference results."""
+    last_seq = 0
+    canvases = CanvasRing()
+    while video_thread != None and not video_thread.stopped:
+        seq, frame = video_thread.read_newer(last_seq, timeout=1.0)
+        if frame is None:
             continue
-        frame_bytes = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+        last_seq = seq
+        start = time.time()
+        canvas = cv2.flip(frame, 1, canvases.take(frame.shape, frame.dtype))
+        canvases.keep(canvas)
+        results = result_store.latest()
+        draw_results(canvas, results)
+        latency.record("render", time.time() - start)
+        if results.captured_at is not None:
+            latency.record("overlayAge", start - results.captured_at)
+        yield canvas
+
+
+def init_pipeline():
+    """Build the models and per-camera state.
+
+    Called from main() rather than at import: spawned enrollment workers
+    re-import this module and should only load face_recognition.
+    """
+    global face_rec, mp_pose, mp_drawing, pose_detector, events, face_tracker
+    global face_gate, pose_gate, recognition_scheduler, roi_planner, scale_tuner, streams
+    # Imported here with the pose model, for the same reason.
+    import mediapipe as mp
+
+    face_rec = sfr.SimpleFacerec(
+        index=os.environ.get("GALLERY_INDEX", "exact"),
+        detector=os.environ.get("FACE_DETECTOR", "hog"),
+    )
+    mp_pose = mp.solutions.pose
+    mp_drawing = mp.solutions.drawing_utils
+    pose_detector = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5, model_complexity=1)
+    events = events_from_env(os.environ)
+    face_tracker = FaceTracker() if os.environ.get("FACE_TRACKING", "1") == "1" else None
+    face_gate = gate_from_env(os.environ)
+    pose_gate = gate_from_env(os.environ)
+    recognition_scheduler = (
+        scheduler_from_env(os.environ) if os.environ.get("ADAPTIVE_SCHEDULER", "1") == "1" else None
+    )
+    roi_planner = roi_from_env(os.environ, face_rec)
+    scale_tuner = tuner_from_env(os.environ, face_rec)
+    streams = streams_from_env(gen_frames)
 
 
 HTML_PAGE = """
@@ -161,25 +236,72 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    return Response(gen_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    broadcaster = streams.get(request.args.get('profile'))
+    if broadcaster is None:
+        abort(404)
+    return Response(broadcaster.frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+@app.route("/stats")
+def stats():
+    return jsonify(collect_stats())
+
+
+def collect_stats():
+    return {
+        "faceTracking": face_tracker.stats() if face_tracker is not None else None,
+        "roi": roi_planner.stats() if roi_planner is not None else None,
+        "detectionScale": scale_tuner.stats() if scale_tuner is not None else None,
+        "faceGate": face_gate.stats() if face_gate is not None else None,
+        "poseGate": pose_gate.stats() if pose_gate is not None else None,
+        "stream": streams.stats(),
+        "latency": latency.stats(),
+        "capture": video_thread.stats() if video_thread is not None else None,
+        "inferencePasses": result_store.published,
+        "reporter": reporter.stats(),
+        "events": events.stats() if events is not None else None,
+        "recognitionScheduler": (
+            recognition_scheduler.stats() if recognition_scheduler is not None else None
+        ),
+    }
+
+
+@app.route("/gallery/reload", methods=["POST"])
+def gallery_reload():
+    return jsonify(gallery_watcher.reload())
+
+
+def set_gallery(emps):
+    global c
+    c = emps
+    if face_tracker is not None:
+        face_tracker.refresh_identities(emps)
 
 
 def update_json(roomId, cameraId, interval_sec):
     """Background task to write face detection data to JSON every 5 seconds."""
     while True:
-        if last_motion_state1 == "Idle":
+        results = result_store.latest()
+        if events is None and results.motion_state == "Idle":
             time.sleep(interval_sec)
             continue
         face_data = {
-            "faceDetected": len(last_face_locations) > 0,
+            "faceDetected": len(results.face_locations) > 0,
             "timestamp": time.time(),
-            "headCount": len(last_face_locations),
-            "empIds": last_face_names,
+            "headCount": len(results.face_locations),
+            "empIds": results.face_names,
             "roomId": roomId,
             "cameraId": cameraId,
         }
-        print(json.dumps(face_data), flush=True)
-        time.sleep(interval_sec)
+        if events is None:
+            reporter.send(face_data)
+            time.sleep(interval_sec)
+            continue
+        # Event mode reports motion flips too, so idle cameras are observed.
+        face_data["motionState"] = results.motion_state
+        for record in events.observe(face_data):
+            reporter.send(record)
+        time.sleep(events.poll_sec)
 
 video_thread = None
 
@@ -191,23 +313,48 @@ def main():
     print(data1)
     global c
     c = data1
-    face_rec.load_encoding_images(c)
+    init_pipeline()
+    cache_dir = os.environ.get(
+        "ENCODING_CACHE_DIR", os.path.dirname(os.path.abspath(sys.argv[1]))
+    )
+    workers = int(os.environ.get("ENROLL_WORKERS", "1"))
+    face_rec.load_encoding_images(c, cache_dir, workers=workers)
+    global gallery_watcher
+    gallery_watcher = GalleryWatcher(
+        face_rec, sys.argv[1], c, cache_dir, workers, on_update=set_gallery,
+        poll_sec=float(os.environ.get("GALLERY_WATCH_SEC", "2")),
+    ).start()
     stream_url = sys.argv[2]
     room_id = sys.argv[3]
     camera_id = sys.argv[4]
     interval_sec = int(sys.argv[5])
+    brokers = sys.argv[6] if len(sys.argv) > 6 else os.environ.get("KAFKA_BROKER_URL")
+    global reporter
+    reporter = make_reporter(brokers, os.environ)
+    atexit.register(reporter.close)
     global video_thread
     time.sleep(2.0)
     json_thread = threading.Thread(
     target=update_json, args=(room_id, camera_id, interval_sec), daemon=True
     )
-    video_thread = VideoCaptureThread(stream_url).start()
-    # detect_thread = threading.Thread(
-    #     target=detection_worker, args=(video_thread, interval_sec), daemon=True
-    # )
-    # detect_thread.start()
+    video_thread = VideoCaptureThread(
+        stream_url, capture=capture_from_env(os.environ),
+        reconnect=reconnect_from_env(os.environ),
+    ).start()
+    inference_thread = threading.Thread(target=inference_worker, daemon=True)
+    inference_thread.start()
     json_thread.start()
-    app.run(host='0.0.0.0', port=5000)
+    if headless_enabled(os.environ):
+        # Analytics only: inference + JSON reporting, no drawing, JPEG or Flask.
+        report_headroom(
+            lambda: headroom_meter.report(video_thread.ring.seq),
+            float(os.environ.get("HEADROOM_REPORT_SEC", "10")),
+        )
+    elif os.environ.get("STREAM_SERVER", "flask") == "async":
+        from async_server import run_async_server
+        run_async_server(streams, 5000, collect_stats, gallery_watcher.reload)
+    else:
+        app.run(host='0.0.0.0', port=5000)
 
 
 if __name__ == '__main__':
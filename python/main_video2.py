@@ -4,120 +4,104 @@ import threading
 import sys
 import json
 import time
-from flask import Flask, Response, render_template_string
+import os
+import atexit
+from flask import Flask, Response, abort, jsonify, render_template_string, request
 from simple_facerec2 import SimpleFacerec
-
-
-class ThreadedVideoStream:
-    def __init__(self, src):
-        self.cap = cv2.VideoCapture(src)
-        if not self.cap.isOpened():
-            raise Exception("Cannot open video stream")
-        self.ret, self.frame = self.cap.read()
-        self.stopped = False
-        self.lock = threading.Lock()
-
-    def start(self):
-        threading.Thread(target=self.update, daemon=True).start()
-        return self
-
-    def update(self):
-        while not self.stopped:
-            try:
-                ret, frame = self.cap.read()
-            except cv2.error as e:
-                print("Error reading frame:", e)
-                self.stop()
-                break
-            with self.lock:
-                self.ret = ret
-                self.frame = frame
-            time.sleep(0.005)
-
-    def read(self):
-        with self.lock:
-            frame = self.frame.copy() if self.frame is not None else None
-            ret = self.ret
-        return ret, frame
-
-    def stop(self):
-        self.stopped = True
-        self.cap.release()
+from gallery_watcher import GalleryWatcher
+from kafka_reporter import make_reporter
+from camera_events import events_from_env
+from headless import HeadroomMeter, headless_enabled, report_headroom
+from video_stream import ThreadedVideoStream, capture_from_env, reconnect_from_env
+from pipeline import LatencyBreakdown
+from overlay import draw_faces
+from stream_profiles import CanvasRing, streams_from_env
+from motion_gate import gate_from_env
+from roi import roi_from_env
+from detection_policy import tuner_from_env
+from scheduler import scheduler_from_env
 
 
 latest_face_locations = []
 latest_face_names = []
 detection_lock = threading.Lock()
+latency = LatencyBreakdown()
 
 c = {}
 
 
-def detection_worker(sfr, video_stream, detection_interval=0.5):
+def detection_worker(
+    sfr, video_stream, detection_interval=0.5, gate=None, scheduler=None, meter=None,
+    roi=None, tuner=None,
+):
     global latest_face_locations, latest_face_names
+    last_seq = 0
     while True:
-        ret, frame = video_stream.read()
-        if not ret or frame is None:
-            time.sleep(detection_interval)
+        if scheduler is not None:
+            time.sleep(scheduler.wait_time())
+        seq, frame = video_stream.read_newer(last_seq, timeout=detection_interval)
+        if frame is None:
+            continue
+        last_seq = seq
+        captured_at = video_stream.ring.captured_at(seq)
+        if captured_at is not None:
+            latency.record("captureToDetection", time.time() - captured_at)
+        start = time.perf_counter()
+        if gate is not None and not gate.should_process(frame):
+            if meter is not None:
+                meter.record(time.perf_counter() - start)
+            if scheduler is not None:
+                scheduler.skip()
+            else:
+                time.sleep(detection_interval)
             continue
-        face_locations, face_names = sfr.detect_known_faces(frame.copy())
+        scale = tuner.scale_for(frame.shape) if tuner is not None else None
+        rois = None
+        if roi is not None:
+            rois = roi.plan(frame.shape, latest_face_locations, full_resize=scale)
+        probe = None
+        if tuner is not None and rois is None:
+            probe = tuner.probe_frame(sfr, frame, scale)
+        face_locations, face_names = sfr.detect_known_faces(frame, rois, scale)
         with detection_lock:
             latest_face_locations = face_locations
             latest_face_names = face_names
-        time.sleep(detection_interval)
+        elapsed = time.perf_counter() - start
+        latency.record("detection", elapsed)
+        if captured_at is not None:
+            latency.record("captureToResult", time.time() - captured_at)
+        if tuner is not None and rois is None:
+            tuner.observe(sfr, scale, elapsed, face_locations, probe)
+        if meter is not None:
+            meter.record(elapsed)
+        if scheduler is not None:
+            scheduler.record(
+                elapsed, len(face_locations), gate is not None and gate.moving
+            )
+        else:
+            time.sleep(detection_interval)
 
 
 app = Flask(__name__)
 
 
 def generate_frames(sfr, video_stream):
-    while True:
-        ret, frame = video_stream.read()
-        if not ret or frame is None:
+    last_seq = 0
+    canvases = CanvasRing()
+    while not video_stream.stopped:
+        seq, frame = video_stream.read_newer(last_seq, timeout=1.0)
+        if frame is None:
             continue
+        last_seq = seq
+        # Frames from the capture ring are read-only; draw on our own buffer.
+        frame = canvases.copy(frame)
 
         with detection_lock:
             face_locations = latest_face_locations.copy()
             face_names = latest_face_names.copy()
 
-        for face_loc, name in zip(face_locations, face_names):
-            y1, x2, y2, x1 = face_loc
-            if name == "Unknown":
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 200), 2)
-                cv2.putText(
-                    frame, name, (x1, y1 - 10), cv2.FONT_HERSHEY_DUPLEX, 0.8, (0, 0, 200), 2
-                )
-                continue
-            textToDisplay = c[name]["empName"]
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 200), 2)
-            cv2.putText(
-                frame,
-                textToDisplay,
-                (x1, y1 - 10),
-                cv2.FONT_HERSHEY_DUPLEX,
-                0.8,
-                (0, 0, 200),
-                2,
-            )
-
-        head_count = len(face_locations)
-        cv2.putText(
-            frame,
-            f"Head Count: {head_count}",
-            (10, 30),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1,
-            (0, 255, 0),
-            2,
-        )
-
-        ret, buffer = cv2.imencode(".jpg", frame)
-        if not ret:
-            continue
-        frame_bytes = buffer.tobytes()
-
-        yield (
-            b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + frame_bytes + b"\r\n"
-        )
+        draw_faces(frame, face_locations, face_names, c)
+        yield frame
 
 
 HTML_PAGE = """
@@ -139,13 +123,50 @@ def index():
 
 @app.route("/video_feed")
 def video_feed():
+    broadcaster = app.config["streams"].get(request.args.get("profile"))
+    if broadcaster is None:
+        abort(404)
     return Response(
-        generate_frames(app.config["sfr"], app.config["video_stream"]),
+        broadcaster.frames(),
         mimetype="multipart/x-mixed-replace; boundary=frame",
     )
 
 
-def update_json(roomId, cameraId, interval_sec):
+@app.route("/stats")
+def stats():
+    return jsonify(collect_stats())
+
+
+def collect_stats():
+    gate = app.config["motion_gate"]
+    return {
+        "motionGate": gate.stats() if gate is not None else None,
+        "scheduler": app.config["scheduler"].stats(),
+        "roi": app.config["roi"].stats() if app.config["roi"] is not None else None,
+        "detectionScale": (
+            app.config["tuner"].stats() if app.config["tuner"] is not None else None
+        ),
+        "stream": app.config["streams"].stats(),
+        "capture": app.config["video_stream"].stats(),
+        "latency": latency.stats(),
+        "reporter": app.config["reporter"].stats(),
+        "events": (
+            app.config["events"].stats() if app.config["events"] is not None else None
+        ),
+    }
+
+
+@app.route("/gallery/reload", methods=["POST"])
+def gallery_reload():
+    return jsonify(app.config["gallery_watcher"].reload())
+
+
+def set_gallery(emps):
+    global c
+    c = emps
+
+
+def update_json(roomId, cameraId, interval_sec, reporter, events=None):
     """Background task to write face detection data to JSON every 5 seconds."""
     while True:
         face_data = {
@@ -156,8 +177,13 @@ def update_json(roomId, cameraId, interval_sec):
             "roomId": roomId,
             "cameraId": cameraId,
         }
-        print(json.dumps(face_data), flush=True)
-        time.sleep(interval_sec)
+        if events is None:
+            reporter.send(face_data)
+            time.sleep(interval_sec)
+            continue
+        for record in events.observe(face_data):
+            reporter.send(record)
+        time.sleep(events.poll_sec)
 
 
 def main():
@@ -168,33 +194,94 @@ def main():
     print(data1)
     global c
     c = data1
-    sfr = SimpleFacerec()
-    sfr.load_encoding_images(c)
+    sfr = SimpleFacerec(
+        index=os.environ.get("GALLERY_INDEX", "exact"),
+        detector=os.environ.get("FACE_DETECTOR", "hog"),
+    )
+    cache_dir = os.environ.get(
+        "ENCODING_CACHE_DIR", os.path.dirname(os.path.abspath(sys.argv[1]))
+    )
+    workers = int(os.environ.get("ENROLL_WORKERS", "1"))
+    sfr.load_encoding_images(c, cache_dir, workers=workers)
+    gallery_watcher = GalleryWatcher(
+        sfr, sys.argv[1], c, cache_dir, workers, on_update=set_gallery,
+        poll_sec=float(os.environ.get("GALLERY_WATCH_SEC", "2")),
+    ).start()
     stream_url = sys.argv[2]
     room_id = sys.argv[3]
     camera_id = sys.argv[4]
     interval_sec = int(sys.argv[5])
+    brokers = sys.argv[6] if len(sys.argv) > 6 else os.environ.get("KAFKA_BROKER_URL")
+    reporter = make_reporter(brokers, os.environ)
+    atexit.register(reporter.close)
+    events = events_from_env(os.environ)
     try:
-        video_stream = ThreadedVideoStream(stream_url).start()
+        video_stream = ThreadedVideoStream(
+            stream_url, capture=capture_from_env(os.environ),
+            reconnect=reconnect_from_env(os.environ),
+        ).start()
     except Exception as e:
         print("Error starting video stream:", e)
         return
 
     time.sleep(2.0)
 
+    motion_gate = gate_from_env(os.environ)
+    scheduler = scheduler_from_env(os.environ)
+    roi = roi_from_env(os.environ, sfr)
+    tuner = tuner_from_env(os.environ, sfr)
+    if headless_enabled(os.environ):
+        # Analytics only: detection + JSON reporting, no drawing, JPEG or Flask.
+        meter = HeadroomMeter()
+        threading.Thread(
+            target=detection_worker,
+            args=(sfr, video_stream, 0.5, motion_gate, scheduler, meter, roi, tuner),
+            daemon=True,
+        ).start()
+        threading.Thread(
+            target=update_json,
+            args=(room_id, camera_id, interval_sec, reporter, events),
+            daemon=True,
+        ).start()
+        report_headroom(
+            lambda: meter.report(video_stream.ring.seq),
+            float(os.environ.get("HEADROOM_REPORT_SEC", "10")),
+        )
+        return
     # detection_thread = threading.Thread(
-    #     target=detection_worker, args=(sfr, video_stream, 0.5), daemon=True
+    #     target=detection_worker,
+    #     args=(sfr, video_stream, 0.5, motion_gate, scheduler, None, roi, tuner),
+    #     daemon=True,
     # )
     # detection_thread.start()
     json_thread = threading.Thread(
-        target=update_json, args=(room_id, camera_id, interval_sec), daemon=True
+        target=update_json,
+        args=(room_id, camera_id, interval_sec, reporter, events),
+        daemon=True,
     )
     json_thread.start()
 
     app.config["sfr"] = sfr
+    app.config["reporter"] = reporter
+    app.config["events"] = events
+    app.config["motion_gate"] = motion_gate
+    app.config["scheduler"] = scheduler
+    app.config["roi"] = roi
+    app.config["tuner"] = tuner
     app.config["video_stream"] = video_stream
+    app.config["streams"] = streams_from_env(
+        lambda: generate_frames(sfr, video_stream)
+    )
+    app.config["gallery_watcher"] = gallery_watcher
+
+    if os.environ.get("STREAM_SERVER", "flask") == "async":
+        from async_server import run_async_server
 
-    app.run(host="0.0.0.0", port=5222, debug=False)
+        run_async_server(
+            app.config["streams"], 5222, collect_stats, gallery_watcher.reload
+        )
+    else:
+        app.run(host="0.0.0.0", port=5222, debug=False)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,166 @@
+import threading
+import time
+
+
+def mjpeg_part(frame_bytes, timestamp=None):
+    headers = b"Content-Type: image/jpeg\r\nContent-Length: %d\r\n" % len(frame_bytes)
+    if timestamp is not None:
+        # When the JPEG was published by the encoder, not when the frame was
+        # captured: load tests measure delivery lag (fan-out, queueing and
+        # network) from it, excluding capture, inference and encode time.
+        headers += b"X-Timestamp: %.6f\r\n" % timestamp
+    return b"--frame\r\n" + headers + b"\r\n" + frame_bytes + b"\r\n"
+
+
+def _offer(queue, item):
+    # Latest-only queue: replace a frame the client has not picked up yet.
+    if queue.full():
+        queue.get_nowait()
+        queue.dropped += 1
+    queue.put_nowait(item)
+
+
+class FrameHub:
+    """Runs a generator on one producer thread and shares its newest item.
+
+    The producer only pulls from `source` while at least one consumer has
+    joined, so nothing is drawn or encoded when nobody is watching.
+    Consumers call wait_newer() with the last sequence number they handled.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.item = None
+        self.timestamp = None
+        self.viewers = 0
+        self.produced = 0
+        self.thread = None
+
+    def _publish(self, item):
+        self.seq += 1
+        self.item = item
+        self.timestamp = time.time()
+        self.produced += 1
+        self.cond.notify_all()
+
+    def _produce(self):
+        for item in self.source():
+            with self.cond:
+                self._publish(item)
+                self.cond.wait_for(lambda: self.viewers > 0)
+        with self.cond:
+            self.thread = None
+            self._finished()
+            self.cond.notify_all()
+
+    def _finished(self):
+        pass
+
+    def _join(self):
+        self.viewers += 1
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._produce, daemon=True)
+            self.thread.start()
+        self.cond.notify_all()
+
+    def join(self):
+        with self.cond:
+            self._join()
+
+    def leave(self):
+        with self.cond:
+            self.viewers -= 1
+
+    def wait_newer(self, last_seq, timeout=1.0):
+        """Return (seq, item, timestamp) newer than `last_seq`.
+
+        Returns (last_seq, None, None) on timeout, and (None, None, None)
+        once the source has ended.
+        """
+        with self.cond:
+            self.cond.wait_for(
+                lambda: self.seq > last_seq or self.thread is None, timeout
+            )
+            if self.seq > last_seq:
+                return self.seq, self.item, self.timestamp
+            if self.thread is None:
+                return None, None, None
+            return last_seq, None, None
+
+
+class FrameBroadcaster(FrameHub):
+    """Encodes each annotated frame once and fans it out to every viewer.
+
+    `source` is a generator function yielding JPEG bytes (drawing + encoding
+    happen there). Each viewer sends the newest JPEG it has not sent yet, so
+    a slow client skips frames instead of holding up the producer or the
+    other viewers. Thread-per-client servers iterate frames(); asyncio
+    servers use subscribe()/unsubscribe().
+    """
+
+    def __init__(self, source):
+        super().__init__(source)
+        self.subscribers = set()
+        self.sent = 0
+        self.dropped = 0
+
+    def _publish(self, item):
+        super()._publish(item)
+        for loop, queue in self.subscribers:
+            loop.call_soon_threadsafe(_offer, queue, (self.seq, item, self.timestamp))
+
+    def _finished(self):
+        for loop, queue in self.subscribers:
+            loop.call_soon_threadsafe(_offer, queue, None)
+
+    def subscribe(self, loop, queue):
+        """Register an asyncio viewer; frames are offered to its 1-slot queue.
+
+        The queue receives (seq, jpeg bytes, timestamp) tuples, or None when
+        the source ends. Call unsubscribe() when the client goes away.
+        """
+        queue.dropped = 0
+        queue.sent = 0
+        with self.cond:
+            self.subscribers.add((loop, queue))
+            self._join()
+
+    def unsubscribe(self, loop, queue):
+        with self.cond:
+            self.subscribers.discard((loop, queue))
+            self.viewers -= 1
+            self.dropped += queue.dropped
+            self.sent += queue.sent
+
+    def frames(self):
+        """Per-viewer generator of multipart/x-mixed-replace chunks."""
+        self.join()
+        last_seq = self.seq
+        sent_any = False
+        try:
+            while True:
+                seq, frame_bytes, timestamp = self.wait_newer(last_seq)
+                if seq is None:
+                    return
+                if frame_bytes is None:
+                    continue
+                with self.cond:
+                    if sent_any and seq - last_seq > 1:
+                        self.dropped += seq - last_seq - 1
+                    self.sent += 1
+                sent_any = True
+                last_seq = seq
+                yield mjpeg_part(frame_bytes, timestamp)
+        finally:
+            self.leave()
+
+    def stats(self):
+        with self.cond:
+            return {
+                "viewers": self.viewers,
+                "framesEncoded": self.produced,
+                "framesSent": self.sent,
+                "framesDroppedForSlowViewers": self.dropped,
+            }
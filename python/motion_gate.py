@@ -0,0 +1,75 @@
+import time
+import cv2
+
+
+class MotionGate:
+    """Cheap frame-difference check in front of the heavy models.
+
+    Each frame is shrunk to a small blurred grayscale thumbnail and compared
+    with the thumbnail of the last frame that was let through. A thumbnail
+    pixel has changed when it differs by more than `threshold` (in 0-255
+    gray levels). The frame is let through when more than `min_fraction` of
+    the pixels changed, so a small or distant person entering still counts,
+    or when `min_refresh_sec` has passed since the last one, so results never
+    go stale for longer than that on a static scene. `last_score` is the
+    fraction of changed pixels; `moving` tells whether the last frame let
+    through passed on change rather than on the refresh timer.
+    """
+
+    def __init__(self, threshold=15.0, min_fraction=0.002, min_refresh_sec=5.0,
+                 size=(160, 120)):
+        self.threshold = threshold
+        self.min_fraction = min_fraction
+        self.min_refresh_sec = min_refresh_sec
+        self.size = size
+        self.reference = None
+        self.last_pass = 0.0
+        self.last_score = 0.0
+        self.moving = False
+        self.passed = 0
+        self.skipped = 0
+
+    def thumbnail(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def should_process(self, frame, now=None):
+        now = time.time() if now is None else now
+        thumb = self.thumbnail(frame)
+        if self.reference is None or self.reference.shape != thumb.shape:
+            changed = True
+        else:
+            diff = cv2.absdiff(thumb, self.reference)
+            self.last_score = float((diff > self.threshold).mean())
+            changed = self.last_score > self.min_fraction
+        if changed or now - self.last_pass >= self.min_refresh_sec:
+            self.moving = changed
+            self.reference = thumb
+            self.last_pass = now
+            self.passed += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def stats(self):
+        return {
+            "passed": self.passed,
+            "skipped": self.skipped,
+            "lastScore": self.last_score,
+        }
+
+
+def gate_from_env(environ):
+    """MotionGate configured by MOTION_* variables.
+
+    MOTION_THRESHOLD is the per-pixel gray-level difference that counts as
+    change, MOTION_MIN_FRACTION the share of changed pixels that passes.
+    """
+    if environ.get("MOTION_GATE", "1") != "1":
+        return None
+    return MotionGate(
+        threshold=float(environ.get("MOTION_THRESHOLD", "15")),
+        min_fraction=float(environ.get("MOTION_MIN_FRACTION", "0.002")),
+        min_refresh_sec=float(environ.get("MOTION_MIN_REFRESH_SEC", "5")),
+    )
@@ -0,0 +1,372 @@
+import threading
+import sys
+import json
+import time
+import os
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, abort, jsonify, render_template_string, request
+from simple_facerec2 import SimpleFacerec
+from face_batcher import EncodingBatcher
+from face_workers import FaceWorkerPool
+from video_stream import ThreadedVideoStream, capture_from_env, reconnect_from_env
+from pipeline import LatencyBreakdown
+from overlay import draw_faces
+from kafka_reporter import make_reporter
+from camera_events import events_from_env
+from headless import CpuMeter, HeadroomMeter, headless_enabled, report_headroom
+from stream_profiles import CanvasRing, streams_from_env
+from motion_gate import gate_from_env
+from roi import roi_from_env
+from detection_policy import tuner_from_env
+from scheduler import scheduler_from_env
+
+
+# One process serving many cameras: a single SimpleFacerec (gallery) is
+# shared by every camera and detection is scheduled across cameras on a
+# thread pool, instead of one model-py container per camera. The dlib work
+# itself runs on DETECTION_PROCESSES worker processes (face_workers), since
+# dlib holds the GIL; DETECTION_PROCESSES=0 keeps it on the threads.
+
+
+class CameraWorker:
+    def __init__(self, job, emps, cpu_budget, wake, sfr):
+        self.room_id = str(job["roomId"])
+        self.camera_id = str(job["cameraId"])
+        self.stream_url = job["videoLink"]
+        self.emps = emps
+        self.video_stream = None
+        self.streams = None
+        self.face_locations = []
+        self.face_names = []
+        self.lock = threading.Lock()
+        self.busy = False
+        self.last_seq = 0
+        self.wake = wake
+        self.motion_gate = gate_from_env(os.environ)
+        self.scheduler = scheduler_from_env(os.environ, cpu_budget)
+        self.meter = HeadroomMeter()
+        self.latency = LatencyBreakdown()
+        self.events = events_from_env(os.environ)
+        self.roi = roi_from_env(os.environ, sfr)
+        self.tuner = tuner_from_env(os.environ, sfr)
+
+    def start(self):
+        self.video_stream = ThreadedVideoStream(
+            self.stream_url, capture=capture_from_env(os.environ),
+            reconnect=reconnect_from_env(os.environ),
+        ).start()
+        self.streams = streams_from_env(lambda: generate_frames(self))
+        return self
+
+    def detect(self, sfr):
+        try:
+            seq, frame = self.video_stream.read_seq()
+            if frame is None or seq == self.last_seq:
+                return
+            self.last_seq = seq
+            captured_at = self.video_stream.ring.captured_at(seq)
+            start = time.perf_counter()
+            if self.motion_gate is not None and not self.motion_gate.should_process(frame):
+                self.meter.record(time.perf_counter() - start)
+                self.scheduler.skip()
+                return
+            scale = self.tuner.scale_for(frame.shape) if self.tuner is not None else None
+            rois = None
+            if self.roi is not None:
+                rois = self.roi.plan(frame.shape, self.latest()[0], full_resize=scale)
+            probe = None
+            if self.tuner is not None and rois is None:
+                probe = self.tuner.probe_frame(sfr, frame, scale)
+            face_locations, face_names = sfr.detect_known_faces(frame, rois, scale)
+            elapsed = time.perf_counter() - start
+            if self.tuner is not None and rois is None:
+                self.tuner.observe(sfr, scale, elapsed, face_locations, probe)
+            self.meter.record(elapsed)
+            self.latency.record("detection", elapsed)
+            if captured_at is not None:
+                self.latency.record("captureToResult", time.time() - captured_at)
+            self.scheduler.record(
+                elapsed, len(face_locations),
+                self.motion_gate is not None and self.motion_gate.moving,
+            )
+            # The shared gallery holds every camera's roster; only report
+            # employees assigned to this camera, like a dedicated container.
+            face_names = [name if name in self.emps else "Unknown" for name in face_names]
+            with self.lock:
+                self.face_locations = face_locations
+                self.face_names = face_names
+        except Exception as e:
+            print(f"Detection failed for camera {self.camera_id}:", e)
+        finally:
+            self.busy = False
+            self.wake.set()
+
+    def latest(self):
+        with self.lock:
+            return list(self.face_locations), list(self.face_names)
+
+
+def schedule_detection(sfr, cameras, pool, wake):
+    """Submit a detection for every camera that is due and not already queued.
+
+    Sleeps until the earliest camera is due, or until a running detection
+    finishes (`wake`) and its camera can be rescheduled.
+    """
+    while True:
+        wake.clear()
+        now = time.time()
+        next_due = 1.0
+        for camera in cameras:
+            if camera.busy:
+                continue
+            if not camera.scheduler.due(now):
+                next_due = min(next_due, camera.scheduler.wait_time(now))
+            elif camera.video_stream.ring.seq == camera.last_seq:
+                # Due, but no new frame yet: look again in about a frame.
+                next_due = min(next_due, 0.04)
+            else:
+                camera.busy = True
+                pool.submit(camera.detect, sfr)
+        wake.wait(next_due)
+
+
+app = Flask(__name__)
+
+
+def generate_frames(camera):
+    last_seq = 0
+    canvases = CanvasRing()
+    while not camera.video_stream.stopped:
+        seq, frame = camera.video_stream.read_newer(last_seq, timeout=1.0)
+        if frame is None:
+            continue
+        last_seq = seq
+        frame = canvases.copy(frame)
+
+        face_locations, face_names = camera.latest()
+        draw_faces(frame, face_locations, face_names, camera.emps)
+        yield frame
+
+
+HTML_PAGE = """
+<html>
+  <head>
+    <title>Live Camera</title>
+  </head>
+  <body>
+    <img src="{{ url_for('video_feed', camera_id=camera_id) }}" width="800">
+  </body>
+</html>
+"""
+
+
+def get_camera(camera_id):
+    camera = app.config["cameras"].get(camera_id)
+    if camera is None:
+        abort(404)
+    return camera
+
+
+@app.route("/cameras/<camera_id>/")
+def index(camera_id):
+    get_camera(camera_id)
+    return render_template_string(HTML_PAGE, camera_id=camera_id)
+
+
+@app.route("/cameras/<camera_id>/video_feed")
+def video_feed(camera_id):
+    broadcaster = get_camera(camera_id).streams.get(request.args.get("profile"))
+    if broadcaster is None:
+        abort(404)
+    return Response(
+        broadcaster.frames(),
+        mimetype="multipart/x-mixed-replace; boundary=frame",
+    )
+
+
+@app.route("/stats")
+def stats():
+    sfr = app.config["sfr"]
+    return jsonify(
+        {
+            "cameras": len(app.config["cameras"]),
+            "reporter": app.config["reporter"].stats(),
+            "encodingBatches": sfr.batcher.stats() if sfr.batcher else None,
+            "faceWorkers": (
+                app.config["face_workers"].stats()
+                if app.config["face_workers"] is not None else None
+            ),
+            "schedulers": {
+                camera_id: camera.scheduler.stats()
+                for camera_id, camera in app.config["cameras"].items()
+            },
+            "streams": {
+                camera_id: camera.streams.stats()
+                for camera_id, camera in app.config["cameras"].items()
+            },
+            "capture": {
+                camera_id: camera.video_stream.stats()
+                for camera_id, camera in app.config["cameras"].items()
+            },
+            "latency": {
+                camera_id: camera.latency.stats()
+                for camera_id, camera in app.config["cameras"].items()
+            },
+            "events": {
+                camera_id: camera.events.stats()
+                for camera_id, camera in app.config["cameras"].items()
+                if camera.events is not None
+            },
+            "detectionScale": {
+                camera_id: camera.tuner.stats()
+                for camera_id, camera in app.config["cameras"].items()
+                if camera.tuner is not None
+            },
+            "roi": {
+                camera_id: camera.roi.stats()
+                for camera_id, camera in app.config["cameras"].items()
+                if camera.roi is not None
+            },
+            "motionGates": {
+                camera_id: camera.motion_gate.stats()
+                for camera_id, camera in app.config["cameras"].items()
+                if camera.motion_gate is not None
+            },
+        }
+    )
+
+
+def update_json(cameras, interval_sec, reporter):
+    """Background task printing one detection record per camera every interval."""
+    poll_sec = min(
+        (camera.events.poll_sec for camera in cameras if camera.events is not None),
+        default=interval_sec,
+    )
+    while True:
+        for camera in cameras:
+            face_locations, face_names = camera.latest()
+            face_data = {
+                "faceDetected": len(face_locations) > 0,
+                "timestamp": time.time(),
+                "headCount": len(face_locations),
+                "empIds": face_names,
+                "roomId": camera.room_id,
+                "cameraId": camera.camera_id,
+            }
+            if camera.events is None:
+                reporter.send(face_data)
+                continue
+            for record in camera.events.observe(face_data):
+                reporter.send(record)
+        time.sleep(poll_sec)
+
+
+def headroom_report(cameras, cpu_meter=None):
+    reports = {
+        camera.camera_id: camera.meter.report(camera.video_stream.ring.seq)
+        for camera in cameras
+    }
+    return {
+        "cameras": reports,
+        "busyCores": round(sum(r["busyFraction"] for r in reports.values()), 3),
+        "cpuCores": cpu_meter.report() if cpu_meter is not None else None,
+    }
+
+
+def main():
+    # python multi_stream.py <jobs.json> <model_data dir> <interval_sec> [kafka broker]
+    # jobs.json is the CameraJob list the worker-server writes to
+    # metadata/jobs.json; each camera's roster is <roomId>-<cameraId>.json.
+    print(sys.argv)
+    with open(sys.argv[1], "r") as file1:
+        jobs = json.load(file1)
+    model_dir = sys.argv[2]
+    interval_sec = int(sys.argv[3])
+    brokers = sys.argv[4] if len(sys.argv) > 4 else os.environ.get("KAFKA_BROKER_URL")
+    reporter = make_reporter(brokers, os.environ)
+    atexit.register(reporter.close)
+    workers = int(os.environ.get("DETECTION_WORKERS", os.cpu_count() or 1))
+
+    rosters = []
+    gallery = {}
+    for job in jobs:
+        feed_path = os.path.join(model_dir, f"{job['roomId']}-{job['cameraId']}.json")
+        with open(feed_path, "r") as f:
+            emps = json.load(f)
+        rosters.append(emps)
+        gallery.update(emps)
+
+    sfr = SimpleFacerec(
+        index=os.environ.get("GALLERY_INDEX", "exact"),
+        detector=os.environ.get("FACE_DETECTOR", "hog"),
+    )
+    sfr.load_encoding_images(
+        gallery,
+        os.environ.get("ENCODING_CACHE_DIR", os.path.abspath(model_dir)),
+        workers=int(os.environ.get("ENROLL_WORKERS", "1")),
+    )
+
+    processes = int(os.environ.get("DETECTION_PROCESSES", workers))
+    face_workers = None
+    if processes > 0:
+        face_workers = FaceWorkerPool(processes, os.environ.get("FACE_DETECTOR", "hog"))
+        atexit.register(face_workers.stop)
+
+    batch_size = int(os.environ.get("ENCODE_BATCH_SIZE", "16"))
+    if batch_size > 1:
+        if face_workers is not None:
+            sfr.batcher = EncodingBatcher(
+                batch_size, float(os.environ.get("ENCODE_MAX_WAIT_MS", "20")),
+                encode=face_workers.encode_batch, concurrency=processes,
+            ).start()
+        else:
+            sfr.batcher = EncodingBatcher(
+                batch_size, float(os.environ.get("ENCODE_MAX_WAIT_MS", "20"))
+            ).start()
+    if face_workers is not None:
+        face_workers.attach(sfr)
+
+    # HOST_CPU_BUDGET is the number of cores recognition may use on this
+    # host, shared evenly between the cameras. It is deliberately not
+    # CPU_BUDGET, which is one camera's share of a core in main_video2.
+    host_budget = float(os.environ.get("HOST_CPU_BUDGET", workers))
+    cpu_budget = host_budget / max(len(jobs), 1)
+    wake = threading.Event()
+    cameras = []
+    for job, emps in zip(jobs, rosters):
+        try:
+            cameras.append(CameraWorker(job, emps, cpu_budget, wake, sfr).start())
+        except Exception as e:
+            print(f"Error starting video stream for camera {job['cameraId']}:", e)
+    print(
+        f"{len(cameras)} cameras running on {workers} detection workers, "
+        f"{processes} worker processes."
+    )
+
+    time.sleep(2.0)
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    threading.Thread(
+        target=schedule_detection, args=(sfr, cameras, pool, wake), daemon=True
+    ).start()
+    threading.Thread(
+        target=update_json, args=(cameras, interval_sec, reporter), daemon=True
+    ).start()
+
+    if headless_enabled(os.environ):
+        cpu_meter = CpuMeter(face_workers.cpu_seconds if face_workers is not None else None)
+        report_headroom(
+            lambda: headroom_report(cameras, cpu_meter),
+            float(os.environ.get("HEADROOM_REPORT_SEC", "10")),
+        )
+        return
+    app.config["sfr"] = sfr
+    app.config["face_workers"] = face_workers
+    app.config["reporter"] = reporter
+    app.config["cameras"] = {camera.camera_id: camera for camera in cameras}
+    app.run(host="0.0.0.0", port=5222, debug=False, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import cv2
+
+
+def draw_faces(frame, face_locations, face_names, emps):
+    """Draw face boxes, employee names and the head count onto `frame`."""
+    for face_loc, name in zip(face_locations, face_names):
+        y1, x2, y2, x1 = face_loc
+        if name == "Unknown":
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 200), 2)
+            cv2.putText(
+                frame, name, (x1, y1 - 10), cv2.FONT_HERSHEY_DUPLEX, 0.8, (0, 0, 200), 2
+            )
+            continue
+        textToDisplay = emps[name]["empName"] if name in emps else name
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 200), 2)
+        cv2.putText(
+            frame,
+            textToDisplay,
+            (x1, y1 - 10),
+            cv2.FONT_HERSHEY_DUPLEX,
+            0.8,
+            (0, 0, 200),
+            2,
+        )
+
+    head_count = len(face_locations)
+    cv2.putText(
+        frame,
+        f"Head Count: {head_count}",
+        (10, 30),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1,
+        (0, 255, 0),
+        2,
+    )
+    return frame
@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+
+
+class StageLatency:
+    """Rolling latency window for one pipeline stage."""
+
+    def __init__(self, window=300):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+
+    def stats(self):
+        with self.lock:
+            samples = np.array(self.samples)
+            count = self.count
+        if not len(samples):
+            return {"count": count}
+        p50, p95 = 1000 * np.percentile(samples, [50, 95])
+        return {
+            "count": count,
+            "meanMs": round(float(1000 * samples.mean()), 2),
+            "p50Ms": round(float(p50), 2),
+            "p95Ms": round(float(p95), 2),
+            "maxMs": round(float(1000 * samples.max()), 2),
+        }
+
+
+class LatencyBreakdown:
+    """Named StageLatency windows, created on first use."""
+
+    def __init__(self, window=300):
+        self.window = window
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def stage(self, name):
+        with self.lock:
+            if name not in self.stages:
+                self.stages[name] = StageLatency(self.window)
+            return self.stages[name]
+
+    def record(self, name, seconds):
+        self.stage(name).record(seconds)
+
+    def stats(self):
+        with self.lock:
+            stages = dict(self.stages)
+        return {name: stage.stats() for name, stage in stages.items()}
+
+
+class InferenceResults:
+    """One inference pass over a captured frame; never mutated once stored."""
+
+    def __init__(
+        self, face_locations=(), face_names=(), pose_landmarks=None,
+        motion_state="Idle", frame_seq=0, captured_at=None, completed_at=None,
+    ):
+        self.face_locations = list(face_locations)
+        self.face_names = list(face_names)
+        self.pose_landmarks = pose_landmarks
+        self.motion_state = motion_state
+        self.frame_seq = frame_seq
+        self.captured_at = captured_at
+        self.completed_at = completed_at
+
+
+class ResultStore:
+    """Latest InferenceResults, written by inference and read by renderers.
+
+    Readers get the stored object itself; writers always publish a new one,
+    so a reader never sees a half-updated result.
+    """
+
+    def __init__(self):
+        self.results = InferenceResults()
+        self.published = 0
+        self.lock = threading.Lock()
+
+    def publish(self, results):
+        with self.lock:
+            self.results = results
+            self.published += 1
+
+    def latest(self):
+        return self.results
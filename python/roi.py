@@ -0,0 +1,126 @@
+import time
+
+
+def _expand(box, margin, shape, min_size):
+    top, right, bottom, left = box
+    height, width = shape[:2]
+    pad_y = max((bottom - top) * margin, (min_size - (bottom - top)) / 2, 0)
+    pad_x = max((right - left) * margin, (min_size - (right - left)) / 2, 0)
+    return (
+        max(int(top - pad_y), 0),
+        min(int(right + pad_x), width),
+        min(int(bottom + pad_y), height),
+        max(int(left - pad_x), 0),
+    )
+
+
+def _overlaps(a, b):
+    return a[3] < b[1] and b[3] < a[1] and a[0] < b[2] and b[0] < a[2]
+
+
+def _merge(rois):
+    """Union overlapping ROIs until none overlap (so no face is found twice)."""
+    rois = list(rois)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rois)):
+            for j in range(i + 1, len(rois)):
+                if _overlaps(rois[i], rois[j]):
+                    a, b = rois[i], rois.pop(j)
+                    rois[i] = (min(a[0], b[0]), max(a[1], b[1]),
+                               max(a[2], b[2]), min(a[3], b[3]))
+                    merged = True
+                    break
+            if merged:
+                break
+    return rois
+
+
+def _area(box):
+    return (box[1] - box[3]) * (box[2] - box[0])
+
+
+class RoiPlanner:
+    """Chooses where in a frame face detection should look.
+
+    ROIs are the previous tick's faces and the pose head keypoints, each
+    grown by a margin, merged where they overlap and given in frame pixels.
+    plan() returns None (scan the full frame) when there is nothing to
+    follow, every `full_scan_sec` so new people are still found, and when
+    scanning the ROIs at `roi_resize` would cost the detector as many pixels
+    as the full frame at `full_resize`.
+
+    Pixel counts in stats() are what the detector actually processes: the
+    full frame at `full_resize`, or the ROIs at the finer `roi_resize`.
+    """
+
+    def __init__(
+        self, full_resize=0.25, roi_resize=0.5, margin=0.75, head_margin=1.0,
+        full_scan_sec=2.0, min_size=64,
+    ):
+        self.full_resize = full_resize
+        self.roi_resize = roi_resize
+        self.margin = margin
+        self.head_margin = head_margin
+        self.full_scan_sec = full_scan_sec
+        self.min_size = min_size
+        self.last_full_scan = 0.0
+        self.full_scans = 0
+        self.roi_scans = 0
+        self.pixels_scanned = 0
+        self.pixels_full = 0
+
+    def plan(self, shape, face_boxes=(), heads=(), now=None, full_resize=None):
+        """ROIs as (top, right, bottom, left), or None for a full-frame scan.
+
+        `heads` is a list of keypoint lists ((x, y, ...) in frame pixels),
+        one per person, e.g. the MediaPipe pose nose/eye/ear/mouth points.
+        `full_resize` overrides the full-frame scale (detection policies).
+        """
+        now = time.time() if now is None else now
+        frame_area = shape[0] * shape[1]
+        full_cost = frame_area * (full_resize or self.full_resize) ** 2
+        self.pixels_full += full_cost
+
+        rois = [_expand(box, self.margin, shape, self.min_size) for box in face_boxes]
+        for points in heads:
+            if not points:
+                continue
+            xs = [p[0] for p in points]
+            ys = [p[1] for p in points]
+            head = (min(ys), max(xs), max(ys), min(xs))
+            rois.append(_expand(head, self.head_margin, shape, self.min_size))
+        rois = [roi for roi in _merge(rois) if _area(roi) > 0]
+        roi_cost = sum(map(_area, rois)) * self.roi_resize ** 2
+
+        if (not rois or now - self.last_full_scan >= self.full_scan_sec
+                or roi_cost >= full_cost):
+            self.last_full_scan = now
+            self.full_scans += 1
+            self.pixels_scanned += full_cost
+            return None
+        self.roi_scans += 1
+        self.pixels_scanned += roi_cost
+        return rois
+
+    def stats(self):
+        saved = 1 - self.pixels_scanned / self.pixels_full if self.pixels_full else 0.0
+        return {
+            "fullScans": self.full_scans,
+            "roiScans": self.roi_scans,
+            "detectorPixels": int(self.pixels_scanned),
+            "detectorPixelsFullFrame": int(self.pixels_full),
+            "pixelsSavedFraction": round(saved, 3),
+        }
+
+
+def roi_from_env(environ, sfr):
+    """RoiPlanner when ROI_MODE=1, sized to the recognizer's resize factors."""
+    if environ.get("ROI_MODE", "0") != "1":
+        return None
+    return RoiPlanner(
+        full_resize=sfr.frame_resizing,
+        roi_resize=sfr.roi_resizing,
+        full_scan_sec=float(environ.get("ROI_FULL_SCAN_SEC", "2")),
+    )
@@ -0,0 +1,111 @@
+import threading
+import time
+
+
+class AdaptiveScheduler:
+    """Decides how often a camera runs face recognition.
+
+    The interval between recognition ticks starts at `base_interval` and is
+    adapted after every tick:
+      - head count changes or motion shorten it (down to `min_interval`);
+      - quiet ticks lengthen it (up to `max_interval`);
+      - it is never shorter than measured latency / `cpu_budget`, so one
+        camera's recognition uses at most `cpu_budget` of a core.
+    `reason` records which rule set the current interval.
+    """
+
+    def __init__(
+        self, base_interval=0.4, min_interval=0.2, max_interval=2.0,
+        cpu_budget=0.5, speedup=0.5, backoff=1.25, latency_alpha=0.3,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.cpu_budget = cpu_budget
+        self.speedup = speedup
+        self.backoff = backoff
+        self.latency_alpha = latency_alpha
+        self.interval = base_interval
+        self.reason = "base"
+        self.latency = 0.0
+        self.head_count = None
+        self.next_run = 0.0
+        self.ticks = 0
+        self.skips = 0
+        self.lock = threading.Lock()
+
+    def due(self, now=None):
+        now = time.time() if now is None else now
+        return now >= self.next_run
+
+    def wait_time(self, now=None):
+        now = time.time() if now is None else now
+        return max(0.0, self.next_run - now)
+
+    def record(self, latency, head_count, moving, now=None):
+        """Feed back one recognition tick and schedule the next one."""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.ticks += 1
+            if self.ticks == 1:
+                self.latency = latency
+            else:
+                self.latency += self.latency_alpha * (latency - self.latency)
+            active = moving or (
+                self.head_count is not None and head_count != self.head_count
+            )
+            self.head_count = head_count
+            self._adapt(active)
+            self.next_run = now + self.interval
+
+    def skip(self, now=None):
+        """A due tick was skipped because the scene did not change."""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.skips += 1
+            self._adapt(False)
+            self.next_run = now + self.interval
+
+    def _adapt(self, active):
+        if active:
+            interval, reason = self.interval * self.speedup, "activity"
+        else:
+            interval, reason = self.interval * self.backoff, "idle"
+        if interval <= self.min_interval:
+            interval, reason = self.min_interval, "min-interval"
+        if interval >= self.max_interval:
+            interval, reason = self.max_interval, "max-interval"
+        floor = self.latency / self.cpu_budget if self.cpu_budget > 0 else 0.0
+        if interval < floor:
+            interval, reason = floor, "cpu-budget"
+        self.interval = interval
+        self.reason = reason
+
+    def stats(self):
+        with self.lock:
+            return {
+                "intervalSec": self.interval,
+                "rateHz": 1.0 / self.interval if self.interval > 0 else None,
+                "reason": self.reason,
+                "latencyMs": 1000 * self.latency,
+                "cpuBudget": self.cpu_budget,
+                "headCount": self.head_count,
+                "ticks": self.ticks,
+                "skips": self.skips,
+            }
+
+
+def scheduler_from_env(environ, cpu_budget=None):
+    """AdaptiveScheduler configured by RECOGNITION_* and CPU_BUDGET variables.
+
+    CPU_BUDGET is the share of one core this camera's recognition may use
+    (default 0.5). multi_stream passes `cpu_budget` itself, derived from
+    HOST_CPU_BUDGET, so CPU_BUDGET keeps this meaning in every container.
+    """
+    if cpu_budget is None:
+        cpu_budget = float(environ.get("CPU_BUDGET", "0.5"))
+    return AdaptiveScheduler(
+        base_interval=float(environ.get("RECOGNITION_INTERVAL_SEC", "0.4")),
+        min_interval=float(environ.get("RECOGNITION_MIN_INTERVAL_SEC", "0.2")),
+        max_interval=float(environ.get("RECOGNITION_MAX_INTERVAL_SEC", "2.0")),
+        cpu_budget=cpu_budget,
+    )
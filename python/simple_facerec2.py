@@ -2,62 +2,279 @@ import face_recognition
 import cv2
 import os
 import glob
+import time
+import copy
+import multiprocessing
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from face_index import make_index
+from face_detectors import make_detector
+from encoding_cache import EncodingCache, content_hash
+
+
+def encode_image_bytes(data):
+    """Decode an enrollment image and encode its first face.
+
+    Returns (ok, encoding): ok is False when the bytes are not a readable
+    image, encoding is None when no face was found.
+    """
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return False, None
+
+    rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+    encodings = face_recognition.face_encodings(rgb_img)
+    if len(encodings) > 0:
+        return True, encodings[0]
+    return True, None
+
+
+def timed_encode_image_bytes(data):
+    start = time.perf_counter()
+    ok, encoding = encode_image_bytes(data)
+    return ok, encoding, time.perf_counter() - start
 
 
 class SimpleFacerec:
-    def __init__(self):
-        self.known_face_encodings = []
-        self.known_face_names = []
+    def __init__(self, tolerance=0.6, index="exact", detector="hog", detector_kwargs=None,
+                 **index_kwargs):
+        self.index = make_index(index, tolerance=tolerance, **index_kwargs)
+        self.detector = make_detector(detector, **(detector_kwargs or {}))
         self.frame_resizing = 0.25
+        self.roi_resizing = 0.5
+        self.batcher = None
+
+    @property
+    def known_face_encodings(self):
+        return self.index.encodings
 
-    def load_encoding_images(self, emps):
+    @property
+    def known_face_names(self):
+        return self.index.names
+
+    def remove_employees(self, emp_ids):
+        return self.index.remove(emp_ids)
+
+    def load_encoding_images(self, emps, cache_dir=None, workers=1, index=None):
+        """Enroll every image of every employee in `emps` (a ModelFeed dict).
+
+        Images missing from the encoding cache are encoded serially, or on a
+        process pool of `workers` processes; results are always applied in
+        feed order so the gallery is identical either way. Encodings go into
+        `index` when given, otherwise into the live gallery.
+        """
         print(f"{len(emps)} encoding images found.")
+        cache = EncodingCache(cache_dir) if cache_dir else None
+        entries = []
+        todo = []
         for _, emp in emps.items():
             for imgLoc in emp["images"]:
-                print(imgLoc)
-                img = cv2.imread(imgLoc)
-                if img is None:
-                    print("Could not read image:", imgLoc)
+                entry = [emp["empId"], imgLoc, True, None]
+                entries.append(entry)
+                try:
+                    with open(imgLoc, "rb") as f:
+                        data = f.read()
+                except OSError:
+                    entry[2] = False
                     continue
+                digest = None
+                if cache is not None:
+                    digest = content_hash(data)
+                    found, encoding = cache.get(digest)
+                    if found:
+                        entry[3] = encoding
+                        continue
+                todo.append((entry, digest, data))
 
-                rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        start = time.perf_counter()
+        busy = self._encode_entries(todo, workers)
+        wall = time.perf_counter() - start
+        if todo:
+            print(
+                f"Encoded {len(todo)} images with {workers} worker(s) in "
+                f"{wall:.1f}s (serial estimate {busy:.1f}s, "
+                f"speedup {busy / max(wall, 1e-9):.2f}x)."
+            )
+        if cache is not None:
+            for entry, digest, _ in todo:
+                if entry[2]:
+                    cache.put(digest, entry[3])
+            print(f"Encoding cache: {cache.hits} hits, {cache.misses} misses.")
+            cache.flush()
 
-                encodings = face_recognition.face_encodings(rgb_img)
-                if len(encodings) > 0:
-                    self.known_face_encodings.append(encodings[0])
-                    self.known_face_names.append(emp["empId"])
-                else:
-                    print("No face found in:", imgLoc)
+        encodings, names = [], []
+        for empId, imgLoc, ok, encoding in entries:
+            print(imgLoc)
+            if not ok:
+                print("Could not read image:", imgLoc)
+            elif encoding is None:
+                print("No face found in:", imgLoc)
+            else:
+                encodings.append(encoding)
+                names.append(empId)
+        if encodings:
+            (self.index if index is None else index).add(encodings, names)
         # print(self.known_face_encodings, self.known_face_names)
         print("Encoding images loaded.")
 
-    def detect_known_faces(self, frame):
-        resize_factor = self.frame_resizing
-        small_frame = cv2.resize(frame, (0, 0), fx=resize_factor, fy=resize_factor)
-        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+    def update_gallery(self, old_emps, new_emps, cache_dir=None, workers=1):
+        """Apply the difference between two ModelFeed dicts to the gallery.
+
+        Departed employees are removed and only added or edited employees are
+        encoded. The update is built on a copy of the index and swapped in at
+        the end, so detect_known_faces keeps matching against the old gallery
+        meanwhile.
+        """
+        removed = [emp_id for emp_id in old_emps if emp_id not in new_emps]
+        added = [emp_id for emp_id in new_emps if emp_id not in old_emps]
+        changed = [
+            emp_id
+            for emp_id in new_emps
+            if emp_id in old_emps
+            and new_emps[emp_id]["images"] != old_emps[emp_id]["images"]
+        ]
+        if not (removed or added or changed):
+            return {"added": [], "removed": [], "changed": []}
 
-        face_locations = face_recognition.face_locations(rgb_small_frame, model="hog")
-        face_encodings = face_recognition.face_encodings(
-            rgb_small_frame, face_locations
+        index = copy.deepcopy(self.index)
+        index.remove(removed + changed)
+        to_encode = {emp_id: new_emps[emp_id] for emp_id in added + changed}
+        self.load_encoding_images(to_encode, cache_dir, workers, index=index)
+        self.index = index
+        print(
+            f"Gallery updated: {len(added)} added, {len(removed)} removed, "
+            f"{len(changed)} changed."
         )
+        return {"added": added, "removed": removed, "changed": changed}
+
+    def _encode_entries(self, todo, workers):
+        """Fill in (ok, encoding) for each todo entry; return summed encode time."""
+        datas = [data for _, _, data in todo]
+        if workers > 1 and len(todo) > 1:
+            # Not fork: update_gallery runs this next to capture, inference
+            # and Flask threads, and forking a threaded process can deadlock.
+            pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            results = pool.map(timed_encode_image_bytes, datas, chunksize=4)
+        else:
+            pool = None
+            results = map(timed_encode_image_bytes, datas)
+        busy = 0.0
+        try:
+            for done, ((entry, _, _), (ok, encoding, elapsed)) in enumerate(
+                zip(todo, results), 1
+            ):
+                entry[2], entry[3] = ok, encoding
+                busy += elapsed
+                if done % 25 == 0 or done == len(todo):
+                    print(f"Encoding progress: {done}/{len(todo)}", flush=True)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return busy
+
+    def downscale(self, frame, scale=None):
+        """RGB copy of the frame downscaled by `scale` (default `frame_resizing`)."""
+        resize_factor = scale or self.frame_resizing
+        small_frame = cv2.resize(frame, (0, 0), fx=resize_factor, fy=resize_factor)
+        return cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+
+    def locate_faces(self, frame, scale=None):
+        """Run the face detector on the frame downscaled by `scale`.
 
-        face_names = []
-        for face_encoding in face_encodings:
-            matches = face_recognition.compare_faces(
-                self.known_face_encodings, face_encoding
+        `scale` defaults to `frame_resizing`. Returns the downscaled RGB frame
+        and face locations in its coordinates.
+        """
+        rgb_small_frame = self.downscale(frame, scale)
+
+        face_locations = self.detector.detect(rgb_small_frame)
+        return rgb_small_frame, face_locations
+
+    def recognize_faces(self, rgb_small_frame, face_locations):
+        """Encode the given faces and match them; returns (names, distances)."""
+        if self.batcher is not None:
+            face_encodings = self.batcher.submit(
+                rgb_small_frame, face_locations
+            ).result()
+        else:
+            face_encodings = face_recognition.face_encodings(
+                rgb_small_frame, face_locations
             )
-            name = "Unknown"
-            face_distances = face_recognition.face_distance(
-                self.known_face_encodings, face_encoding
+
+        return self.index.match(face_encodings)
+
+    def locate_faces_in_regions(self, frame, rois):
+        """Run the face detector inside each (top, right, bottom, left) ROI.
+
+        ROIs are scanned at `roi_resizing`, finer than the full-frame
+        `frame_resizing`, so small distant faces are still found. Returns
+        (RGB crop, locations in the crop, scale, (top, left)) per ROI.
+        Every crop is taken before the detector runs, so all ROIs come from
+        the same frame even when `frame` is a borrowed capture-ring view.
+        """
+        crops = []
+        for top, right, bottom, left in rois:
+            small = cv2.resize(
+                frame[top:bottom, left:right], (0, 0),
+                fx=self.roi_resizing, fy=self.roi_resizing,
             )
-            if len(face_distances) > 0:
-                best_match_index = np.argmin(face_distances)
-                if matches[best_match_index]:
-                    name = self.known_face_names[best_match_index]
-            face_names.append(name)
-
-        face_locations = np.array(face_locations)
-        if face_locations.size != 0:
-            face_locations = (face_locations / resize_factor).astype(int)
-        return face_locations, face_names
+            crops.append((cv2.cvtColor(small, cv2.COLOR_BGR2RGB), (top, left)))
+        return [
+            (rgb, self.detector.detect(rgb), self.roi_resizing, origin)
+            for rgb, origin in crops
+        ]
+
+    def _regions(self, frame, rois, scale=None):
+        if rois is None:
+            scale = scale or self.frame_resizing
+            rgb_small_frame, face_locations = self.locate_faces(frame, scale)
+            return [(rgb_small_frame, face_locations, scale, (0, 0))]
+        return self.locate_faces_in_regions(frame, rois)
+
+    @staticmethod
+    def _region_to_frame(location, scale, origin):
+        top, left = origin
+        t, r, b, l = location
+        return (int(t / scale) + top, int(r / scale) + left,
+                int(b / scale) + top, int(l / scale) + left)
+
+    def detect_known_faces(self, frame, rois=None, scale=None):
+        """Face locations (frame pixels) and names.
+
+        `rois` limits where to look; `scale` overrides `frame_resizing` for
+        full-frame scans (per-camera detection policies pass their own).
+        """
+        locations, face_names = [], []
+        for rgb, face_locations, scale, origin in self._regions(frame, rois, scale):
+            if not len(face_locations):
+                continue
+            names, _ = self.recognize_faces(rgb, face_locations)
+            locations += [self._region_to_frame(loc, scale, origin) for loc in face_locations]
+            face_names += names
+        return np.array(locations), face_names
+
+    def track_known_faces(self, frame, tracker, rois=None, scale=None):
+        """Like detect_known_faces, but only encodes faces the tracker asks for.
+
+        Faces on an existing, still-confident track keep the identity found
+        on an earlier tick instead of being re-encoded. The tracker works in
+        frame pixels, so full-frame and ROI ticks can follow each other.
+        """
+        regions = self._regions(frame, rois, scale)
+        owners = [(r, loc) for r, region in enumerate(regions) for loc in region[1]]
+        locations = [
+            self._region_to_frame(loc, regions[r][2], regions[r][3]) for r, loc in owners
+        ]
+        tracks = tracker.update(locations)
+        todo = [i for i, track in enumerate(tracks) if tracker.needs_recognition(track)]
+        for r, region in enumerate(regions):
+            faces = [i for i in todo if owners[i][0] == r]
+            if not faces:
+                continue
+            names, distances = self.recognize_faces(region[0], [owners[i][1] for i in faces])
+            for i, name, distance in zip(faces, names, distances):
+                tracker.set_identity(tracks[i], name, distance)
+        face_names = [track.name for track in tracks]
+        return np.array(locations), face_names
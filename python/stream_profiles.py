@@ -0,0 +1,189 @@
+import os
+import time
+import cv2
+import numpy as np
+from mjpeg import FrameBroadcaster, FrameHub
+from pipeline import StageLatency
+
+try:
+    from turbojpeg import TurboJPEG, TJSAMP_420
+except ImportError:  # PyTurboJPEG is optional
+    TurboJPEG = None
+
+
+class StreamProfile:
+    def __init__(self, name, width=None, quality=95, max_fps=None):
+        self.name = name
+        self.width = width  # None keeps the source resolution
+        self.quality = quality
+        self.max_fps = max_fps
+
+    def to_dict(self):
+        return {
+            "width": self.width,
+            "quality": self.quality,
+            "maxFps": self.max_fps,
+        }
+
+
+# "full" matches the old /video_feed output (cv2.imencode default quality 95).
+PROFILES = {
+    "full": StreamProfile("full"),
+    "detail": StreamProfile("detail", width=800, quality=80, max_fps=15),
+    "thumb": StreamProfile("thumb", width=320, quality=60, max_fps=5),
+}
+
+
+class OpenCVEncoder:
+    name = "opencv"
+
+    def encode(self, frame, quality):
+        ret, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes() if ret else None
+
+
+class TurboJPEGEncoder:
+    name = "turbojpeg"
+
+    def __init__(self):
+        self.jpeg = TurboJPEG()
+
+    def encode(self, frame, quality):
+        return self.jpeg.encode(frame, quality=quality, jpeg_subsample=TJSAMP_420)
+
+
+def make_encoder(name="opencv"):
+    if name == "turbojpeg":
+        if TurboJPEG is not None:
+            try:
+                return TurboJPEGEncoder()
+            except (OSError, RuntimeError) as e:
+                print("libjpeg-turbo unavailable, using OpenCV:", e)
+        else:
+            print("PyTurboJPEG not installed, using OpenCV JPEG encoder.")
+    return OpenCVEncoder()
+
+
+def encode_profile(hub, profile, encoder, latency=None):
+    """Generator of JPEGs for one profile from the shared annotated frames."""
+    min_gap = 1.0 / profile.max_fps if profile.max_fps else 0.0
+    last_seq = 0
+    last_sent = 0.0
+    while True:
+        wait = last_sent + min_gap - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        # Only count as a hub viewer while waiting for a frame: this generator
+        # sits suspended at `yield` whenever its own profile has no viewers,
+        # and must not keep the renderer running then.
+        hub.join()
+        try:
+            seq, frame, _ = hub.wait_newer(last_seq)
+            if seq is None:
+                return
+            if frame is None:
+                continue
+            last_seq = seq
+            last_sent = time.time()
+            start = time.perf_counter()
+            if profile.width and frame.shape[1] > profile.width:
+                height = round(frame.shape[0] * profile.width / frame.shape[1])
+                frame = cv2.resize(
+                    frame, (profile.width, height), interpolation=cv2.INTER_AREA
+                )
+            frame_bytes = encoder.encode(frame, profile.quality)
+            if latency is not None:
+                latency.record(time.perf_counter() - start)
+        finally:
+            hub.leave()
+        if frame_bytes is not None:
+            yield frame_bytes
+
+
+class ProfiledStreams:
+    """Annotated frames rendered once, encoded once per requested profile.
+
+    `render` is a generator function yielding annotated BGR frames. Each
+    profile gets its own FrameBroadcaster, which only resizes/encodes while
+    that profile has viewers; rendering only runs while any profile does.
+    Each rendered frame is copied before the renderer resumes, so encoders
+    own what they read however long they take, and renderers may redraw
+    into the same buffer every time.
+    """
+
+    def __init__(self, render, profiles=None, encoder=None):
+        self.render = render
+        self.hub = FrameHub(self._snapshots)
+        self.profiles = profiles or PROFILES
+        self.encoder = encoder or OpenCVEncoder()
+        self.encode_latency = {name: StageLatency() for name in self.profiles}
+        self.broadcasters = {
+            name: FrameBroadcaster(self._source(profile))
+            for name, profile in self.profiles.items()
+        }
+
+    def _snapshots(self):
+        # Runs on the hub's producer thread while `render` is suspended at
+        # its yield, so the copy can never see a half-drawn frame.
+        for frame in self.render():
+            yield frame.copy()
+
+    def _source(self, profile):
+        latency = self.encode_latency[profile.name]
+        return lambda: encode_profile(self.hub, profile, self.encoder, latency)
+
+    def get(self, name=None):
+        """Broadcaster for a profile name (default "full"); None if unknown."""
+        return self.broadcasters.get(name or "full")
+
+    def stats(self):
+        return {
+            "encoder": self.encoder.name,
+            "framesRendered": self.hub.produced,
+            "profiles": {
+                name: dict(
+                    profile.to_dict(),
+                    encodeLatency=self.encode_latency[name].stats(),
+                    **self.broadcasters[name].stats()
+                )
+                for name, profile in self.profiles.items()
+            },
+        }
+
+
+def streams_from_env(render, environ=os.environ):
+    """ProfiledStreams using the JPEG encoder named by STREAM_ENCODER."""
+    encoder = make_encoder(environ.get("STREAM_ENCODER", "opencv"))
+    return ProfiledStreams(render, encoder=encoder)
+
+
+class CanvasRing:
+    """Reusable draw buffer(s) for a renderer, saving an allocation per frame.
+
+    ProfiledStreams copies every yielded frame before encoders see it, so
+    one buffer is enough there; `count` > 1 is for consumers that read a
+    yielded frame directly after the renderer has moved on.
+    """
+
+    def __init__(self, count=1):
+        self.canvases = [None] * count
+        self.index = 0
+
+    def take(self, shape, dtype):
+        """Next buffer of the given shape, or None if it must be allocated."""
+        self.index = (self.index + 1) % len(self.canvases)
+        canvas = self.canvases[self.index]
+        if canvas is None or canvas.shape != shape or canvas.dtype != dtype:
+            return None
+        return canvas
+
+    def keep(self, canvas):
+        self.canvases[self.index] = canvas
+        return canvas
+
+    def copy(self, frame):
+        canvas = self.take(frame.shape, frame.dtype)
+        if canvas is None:
+            return self.keep(frame.copy())
+        np.copyto(canvas, frame)
+        return canvas
@@ -0,0 +1,388 @@
+import os
+import random
+import cv2
+import threading
+import time
+
+
+class FrameRing:
+    """Fixed set of frame slots shared by one writer and many readers.
+
+    The capture thread decodes each frame straight into the oldest slot and
+    publishes it with an increasing sequence number. Readers borrow a
+    read-only view of the newest slot instead of copying it; a borrowed view
+    stays valid until `slots - 1` newer frames have been captured, which
+    `is_valid(seq)` can check. Readers that need to draw on a frame must copy
+    it (or write into their own buffer, e.g. `cv2.flip(frame, 1, dst)`).
+    """
+
+    def __init__(self, slots=4):
+        self.slots = [None] * slots
+        self.stamps = [None] * slots
+        self.seq = 0
+        self.waiting = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def next_buffer(self):
+        """Buffer the writer should decode the next frame into (may be None)."""
+        return self.slots[(self.seq + 1) % len(self.slots)]
+
+    def publish(self, frame, captured_at=None):
+        with self.cond:
+            seq = self.seq + 1
+            self.slots[seq % len(self.slots)] = frame
+            self.stamps[seq % len(self.slots)] = (
+                time.time() if captured_at is None else captured_at
+            )
+            self.seq = seq
+            self.cond.notify_all()
+
+    def _view(self, seq):
+        frame = self.slots[seq % len(self.slots)]
+        if frame is None:
+            return None
+        view = frame.view()
+        view.flags.writeable = False
+        return view
+
+    def latest(self):
+        """Return (seq, read-only view) of the newest frame; (0, None) if none yet."""
+        with self.cond:
+            seq = self.seq
+        return seq, self._view(seq) if seq else None
+
+    def wait_newer(self, seq, timeout=None):
+        """Block until a frame newer than `seq` arrives.
+
+        Returns (seq, None) on timeout or once the ring is closed.
+        """
+        with self.cond:
+            self.waiting += 1
+            try:
+                self.cond.wait_for(lambda: self.seq > seq or self.closed, timeout)
+            finally:
+                self.waiting -= 1
+            if self.seq <= seq:
+                return seq, None
+            seq = self.seq
+        return seq, self._view(seq)
+
+    def close(self):
+        """Wake every waiting reader; used when capture stops."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def captured_at(self, seq):
+        """Wall-clock capture time of frame `seq`, or None once overwritten."""
+        stamp = self.stamps[seq % len(self.slots)]
+        return stamp if self.is_valid(seq) else None
+
+    def is_valid(self, seq):
+        return seq > 0 and self.seq - seq < len(self.slots) - 1
+
+
+# FFmpeg demuxer/decoder options for low-latency capture, in OpenCV's
+# OPENCV_FFMPEG_CAPTURE_OPTIONS "key;value|key;value" format. rtsp_transport
+# tcp is what OpenCV uses when the variable is unset, so it is kept.
+LOW_LATENCY_FFMPEG_OPTIONS = "rtsp_transport;tcp|fflags;nobuffer|flags;low_delay"
+
+
+class CaptureOptions:
+    """How a capture thread pulls frames from its VideoCapture.
+
+    mode "read" decodes and publishes every frame, as before. mode "grab"
+    grab()s every frame so the backend never builds a backlog, but only
+    retrieve()s (colour conversion + copy into the ring) when a reader is
+    blocked waiting for a frame, or at `retrieve_fps` for readers that poll.
+    `buffer_size` sets CAP_PROP_BUFFERSIZE (honoured by V4L2/GStreamer, not
+    by the FFmpeg backend); `low_latency` applies LOW_LATENCY_FFMPEG_OPTIONS
+    unless OPENCV_FFMPEG_CAPTURE_OPTIONS is already set.
+    """
+
+    def __init__(self, mode="read", buffer_size=None, low_latency=False, retrieve_fps=5.0):
+        if mode not in ("read", "grab"):
+            raise ValueError(f"Unknown capture mode: {mode}")
+        self.mode = mode
+        self.buffer_size = buffer_size
+        self.low_latency = low_latency
+        self.retrieve_fps = retrieve_fps
+
+    def open(self, src, timeout_sec=None):
+        """Open `src`; `timeout_sec` bounds opening and each read of URL/file sources."""
+        if self.low_latency:
+            # Read by OpenCV when the capture is opened.
+            os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", LOW_LATENCY_FFMPEG_OPTIONS)
+        if timeout_sec and isinstance(src, str):
+            # Camera-index backends (V4L2) reject these open parameters.
+            timeout_ms = int(1000 * timeout_sec)
+            cap = cv2.VideoCapture(src, cv2.CAP_ANY, [
+                cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms,
+                cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms,
+            ])
+        else:
+            cap = cv2.VideoCapture(src)
+        if self.buffer_size is not None:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        return cap
+
+
+def capture_from_env(environ):
+    buffer_size = environ.get("CAPTURE_BUFFER_SIZE")
+    return CaptureOptions(
+        mode=environ.get("CAPTURE_MODE", "read"),
+        buffer_size=int(buffer_size) if buffer_size else None,
+        low_latency=environ.get("CAPTURE_LOW_LATENCY", "0") == "1",
+        retrieve_fps=float(environ.get("CAPTURE_RETRIEVE_FPS", "5")),
+    )
+
+
+class FrameGrabber:
+    """Moves frames from a VideoCapture into a FrameRing per CaptureOptions.
+
+    Frames are stamped with the time they were grabbed, so capture-to-result
+    latencies include any wait for retrieve().
+    """
+
+    def __init__(self, cap, ring, options):
+        self.cap = cap
+        self.ring = ring
+        self.options = options
+        self.retrieve_interval = 1 / options.retrieve_fps if options.retrieve_fps else None
+        self.last_retrieve = 0.0
+        self.grabbed = 0
+        self.retrieved = 0
+
+    def step(self):
+        """Capture one frame; False when the source returned nothing."""
+        if self.options.mode == "read":
+            ret, frame = self.cap.read(self.ring.next_buffer())
+            if ret:
+                self.grabbed += 1
+                self.retrieved += 1
+                self.ring.publish(frame)
+            return ret
+        if not self.cap.grab():
+            return False
+        grabbed_at = time.time()
+        self.grabbed += 1
+        if not self.ring.waiting and (
+            self.retrieve_interval is None
+            or grabbed_at - self.last_retrieve < self.retrieve_interval
+        ):
+            return True
+        ret, frame = self.cap.retrieve(self.ring.next_buffer())
+        if ret:
+            self.last_retrieve = grabbed_at
+            self.retrieved += 1
+            self.ring.publish(frame, grabbed_at)
+        return ret
+
+    def stats(self):
+        return {
+            "mode": self.options.mode,
+            "bufferSize": self.options.buffer_size,
+            "ffmpegOptions": os.environ.get("OPENCV_FFMPEG_CAPTURE_OPTIONS"),
+            "grabbed": self.grabbed,
+            "retrieved": self.retrieved,
+            "dropped": self.grabbed - self.retrieved,
+        }
+
+
+class ReconnectPolicy:
+    """When a capture thread gives up on its source and reopens it.
+
+    A source that fails to open, raises cv2.error or delivers no frame for
+    `stall_sec` is released and reopened after a backoff that starts at
+    `initial_sec` and doubles up to `max_sec`, reset once frames flow again.
+    `enabled=False` keeps the old behaviour of stopping on failure.
+    """
+
+    def __init__(self, enabled=True, initial_sec=0.5, max_sec=30.0, stall_sec=10.0):
+        self.enabled = enabled
+        self.initial_sec = initial_sec
+        self.max_sec = max_sec
+        self.stall_sec = stall_sec
+
+    def delay(self, attempt):
+        delay = min(self.initial_sec * 2 ** attempt, self.max_sec)
+        # Jitter so cameras behind one NVR do not all retry together.
+        return delay * random.uniform(0.8, 1.0)
+
+
+def reconnect_from_env(environ):
+    return ReconnectPolicy(
+        enabled=environ.get("CAPTURE_RECONNECT", "1") == "1",
+        initial_sec=float(environ.get("CAPTURE_BACKOFF_SEC", "0.5")),
+        max_sec=float(environ.get("CAPTURE_BACKOFF_MAX_SEC", "30")),
+        stall_sec=float(environ.get("CAPTURE_STALL_SEC", "10")),
+    )
+
+
+class CaptureStream:
+    """Capture thread feeding a FrameRing, reopening its source when it fails.
+
+    Only the VideoCapture is replaced on reconnect: the ring (and its
+    sequence numbers), readers and whatever models they hold carry on, and
+    simply wait in read_newer() meanwhile. `health` is "connecting",
+    "streaming", "reconnecting" or "stopped".
+    """
+
+    # Whether a failed read stops the stream when reconnecting is disabled.
+    stop_on_empty = False
+
+    def __init__(self, src, slots=4, capture=None, reconnect=None):
+        self.src = src
+        self.capture = capture or CaptureOptions()
+        self.reconnect = reconnect or ReconnectPolicy()
+        self.ring = FrameRing(slots)
+        self.grabber = FrameGrabber(None, self.ring, self.capture)
+        self.cap = None
+        self.ret = False
+        self.stopped = False
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.health = "connecting"
+        self.health_since = time.time()
+        self.opened_at = None
+        self.last_frame_at = None
+        self.attempt = 0
+        self.reconnects = 0
+        self.last_error = None
+
+    def configure(self, cap):
+        """Hook for per-source VideoCapture settings after each (re)open."""
+
+    def _set_health(self, health):
+        if health != self.health:
+            print(f"Capture health: {self.health} -> {health}")
+            self.health = health
+            self.health_since = time.time()
+
+    def _connect(self):
+        """Open the source, after the backoff if this is a retry."""
+        if self.attempt:
+            if self.wakeup.wait(self.reconnect.delay(self.attempt - 1)):
+                return False
+        self.attempt += 1
+        timeout = self.reconnect.stall_sec if self.reconnect.enabled else None
+        cap = self.capture.open(self.src, timeout)
+        if not cap.isOpened():
+            cap.release()
+            self.last_error = "Cannot open video stream"
+            print(f"{self.last_error} (attempt {self.attempt})")
+            if not self.reconnect.enabled:
+                self.stop()
+            return False
+        self.configure(cap)
+        self.cap = cap
+        self.grabber.cap = cap
+        self.opened_at = time.time()
+        return True
+
+    def _lost(self, reason):
+        print(f"Capture lost: {reason}")
+        self.last_error = reason
+        self.cap.release()
+        self.cap = None
+        self.ret = False
+        if not self.reconnect.enabled:
+            self.stop()
+            return
+        self.reconnects += 1
+        self._set_health("reconnecting")
+
+    def start(self):
+        self.thread = threading.Thread(target=self.update, daemon=True)
+        self.thread.start()
+        return self
+
+    def update(self):
+        while not self.stopped:
+            if self.cap is None and not self._connect():
+                continue
+            try:
+                ret = self.grabber.step()
+            except cv2.error as e:
+                self._lost(f"Error reading frame: {e}")
+                continue
+            self.ret = ret
+            now = time.time()
+            if ret:
+                self.last_frame_at = now
+                self.attempt = 0
+                self._set_health("streaming")
+            elif not self.reconnect.enabled:
+                if self.stop_on_empty:
+                    self.stop()
+                else:
+                    time.sleep(0.005)
+            elif now - max(self.last_frame_at or 0, self.opened_at) >= self.reconnect.stall_sec:
+                self._lost(f"no frame for {self.reconnect.stall_sec:g}s")
+            else:
+                # Nothing decoded; don't spin on a stalled source.
+                time.sleep(0.005)
+        if self.cap is not None:
+            self.cap.release()
+
+    def read_seq(self):
+        """Return (seq, frame) so callers can tell whether they saw it already."""
+        return self.ring.latest()
+
+    def read_newer(self, seq, timeout=None):
+        return self.ring.wait_newer(seq, timeout)
+
+    def stats(self):
+        now = time.time()
+        return {
+            **self.grabber.stats(),
+            "health": self.health,
+            "healthForSec": round(now - self.health_since, 1),
+            "lastFrameAgeSec": (
+                round(now - self.last_frame_at, 2) if self.last_frame_at else None
+            ),
+            "reconnects": self.reconnects,
+            "lastError": self.last_error,
+        }
+
+    def stop(self):
+        self.stopped = True
+        self._set_health("stopped")
+        self.wakeup.set()
+        self.ring.close()
+        if self.thread is None and self.cap is not None:
+            self.cap.release()
+
+
+class ThreadedVideoStream(CaptureStream):
+    def __init__(self, src, slots=4, capture=None, reconnect=None):
+        super().__init__(src, slots, capture, reconnect)
+        if self._connect():
+            self.ret = self.grabber.step()
+        elif not self.reconnect.enabled:
+            raise Exception("Cannot open video stream")
+
+    def read(self):
+        """Return (ret, frame) with a read-only view of the newest frame."""
+        _, frame = self.ring.latest()
+        return self.ret, frame
+
+
+class VideoCaptureThread(CaptureStream):
+    stop_on_empty = True
+
+    def __init__(self, src="http://192.168.1.7:4747/video", width=640, height=480, slots=4,
+                 capture=None, reconnect=None):
+        super().__init__(src, slots, capture, reconnect)
+        self.width = width
+        self.height = height
+        self._connect()
+
+    def configure(self, cap):
+        cap.set(3, self.width)
+        cap.set(4, self.height)
+
+    def read(self):
+        """Return a read-only view of the newest frame, or None."""
+        return self.ring.latest()[1]
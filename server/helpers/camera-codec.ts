@@ -0,0 +1,62 @@
+import { JsonOutputJob } from "../types/python";
+
+// Decoder for the compact binary camera records written by
+// python/camera_codec.py (REPORT_ENCODING=binary). JSON records start with
+// "{" and are parsed as before, so both encodings can share the topic.
+
+const SCHEMA_VERSION = 1;
+const UNKNOWN_ID = 0xffffffff;
+const EVENTS = ["snapshot", "change", "heartbeat"] as const;
+const MOTION_STATES = [undefined, "Idle", "Moving"];
+const CHANGES = ["entered", "left", "headCount", "motion"];
+
+function readIds(buf: Buffer, offset: number): [string[], number] {
+  const count = buf.readUInt16LE(offset);
+  offset += 2;
+  const ids: string[] = [];
+  for (let i = 0; i < count; i++, offset += 4) {
+    const id = buf.readUInt32LE(offset);
+    ids.push(id === UNKNOWN_ID ? "Unknown" : String(id));
+  }
+  return [ids, offset];
+}
+
+function decodeCameraMessage(buf: Buffer | null): JsonOutputJob {
+  if (!buf || buf.length === 0) {
+    return JSON.parse("{}");
+  }
+  if (buf[0] === 0x7b) {
+    return JSON.parse(buf.toString());
+  }
+  const version = buf.readUInt8(0);
+  if (version !== SCHEMA_VERSION) {
+    throw new Error(`Unsupported camera record version ${version}`);
+  }
+  const flags = buf.readUInt8(1);
+  const [empIds, offset] = readIds(buf, 20);
+  const record: JsonOutputJob = {
+    faceDetected: (flags & 1) !== 0,
+    timestamp: buf.readDoubleLE(2),
+    roomId: String(buf.readUInt32LE(10)),
+    cameraId: String(buf.readUInt32LE(14)),
+    headCount: buf.readUInt16LE(18),
+    empIds,
+  };
+  const motionState = MOTION_STATES[(flags >> 4) & 3];
+  if (motionState !== undefined) {
+    record.motionState = motionState;
+  }
+  if (flags & 2) {
+    const changes = buf.readUInt8(offset + 12);
+    record.event = EVENTS[(flags >> 2) & 3];
+    record.seq = buf.readUInt32LE(offset);
+    record.epoch = Number(buf.readBigUInt64LE(offset + 4));
+    record.changes = CHANGES.filter((_, i) => (changes >> i) & 1);
+    let next: number;
+    [record.entered, next] = readIds(buf, offset + 13);
+    [record.left] = readIds(buf, next);
+  }
+  return record;
+}
+
+export { decodeCameraMessage };
@@ -5,6 +5,14 @@ type JsonOutputJob = {
   empIds: string[];
   roomId: string;
   cameraId: string;
+  // Present when the camera runs with REPORT_MODE=events.
+  event?: "snapshot" | "change" | "heartbeat";
+  seq?: number;
+  epoch?: number;
+  changes?: string[];
+  entered?: string[];
+  left?: string[];
+  motionState?: string;
 };
 
 type ModelFeed = {
@@ -23,6 +23,7 @@ import { cameraSchema, modelSchema, roomSchema } from "../types/model";
 import path from "path";
 import { CameraJob } from "../types/db";
 import { JsonOutputJob, ModelFeed } from "../types/python";
+import { decodeCameraMessage } from "../helpers/camera-codec";
 import { getDummyJsonOutput } from "../helpers/jobs";
 import { randInt } from "../helpers/random";
 import { Consumer, Kafka, logLevel } from "kafkajs";
@@ -1066,11 +1067,28 @@ async function startKafka() {
       eachMessage: async ({ topic, message }) => {
         try {
           // console.log(message);
-          const jsonData: JsonOutputJob = JSON.parse(
-            message.value ? message.value.toString() : "{}"
-          );
+          const jsonData: JsonOutputJob = decodeCameraMessage(message.value);
           console.log(jsonData);
           const cameras = roomCamera[jsonData.roomId];
+          const prev = cameras[jsonData.cameraId];
+          if (
+            jsonData.seq !== undefined &&
+            prev?.seq !== undefined &&
+            prev.epoch === jsonData.epoch
+          ) {
+            if (jsonData.seq <= prev.seq) {
+              return;
+            }
+            if (jsonData.seq !== prev.seq + 1) {
+              // Every event carries the full camera state, so storing it
+              // below is enough to recover from the missed ones.
+              console.log(
+                `Missed ${jsonData.seq - prev.seq - 1} events from camera ${
+                  jsonData.cameraId
+                }`
+              );
+            }
+          }
           cameras[jsonData.cameraId] = jsonData;
         } catch (error: any) {
           console.log("Kafka run error: ", error?.message);